@@ -0,0 +1,316 @@
+"""
+Offline load test for /query
+
+Starts bench/stub_server.py in place of Groq and OpenWeatherMap, starts the
+app against it, drives concurrent SSE sessions and reports latency,
+throughput and memory. Run from the backend directory:
+
+    python -m bench.run --sessions 50 --turns 4 --label baseline
+    python -m bench.run --sessions 50 --turns 4 --compare bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+
+# Each session cycles through these turns; keywords pick the stub's tool calls
+SCENARIOS = [
+    "Hi, which models do you have in stock?",
+    "What's the weather like for a test drive today?",
+    "What is the address of your dealership?",
+    "Which dealership is nearest to me?",
+    "Which slots are available next week?",
+    "Tell me more about the interior"
+]
+
+# Reported metrics, and whether a higher value is better
+METRICS = {
+    "ttfc_p50_ms": False,
+    "ttfc_p95_ms": False,
+    "ttfc_p99_ms": False,
+    "e2e_p50_ms": False,
+    "e2e_p95_ms": False,
+    "e2e_p99_ms": False,
+    "requests_per_second": True,
+    "events_per_second": True,
+    "bytes_per_request": False,
+    "errors": False,
+    "rss_peak_mb": False
+}
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 1)
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """
+    Resident set size of a process, read from /proc (Linux only)
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL
+    )
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+            try:
+                response = await client.get(url)
+                if response.status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server for {url} did not start within {timeout}s")
+
+
+async def run_query(client: httpx.AsyncClient, url: str, session_id: str, query: str) -> Dict[str, Any]:
+    """
+    Send one /query request and time its SSE events
+    """
+    started = time.perf_counter()
+    first_chunk: Optional[float] = None
+    events = 0
+    received = 0
+    error = None
+    try:
+        async with client.stream("POST", url, json={"query": query, "session_id": session_id}) as response:
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+            else:
+                async for line in response.aiter_lines():
+                    received += len(line) + 1
+                    if not line.startswith("event:"):
+                        continue
+                    event = line[6:].strip()
+                    events += 1
+                    if event == "chunk" and first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+                    elif event == "error":
+                        error = "error event"
+                    elif event == "end":
+                        break
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    return {
+        "ttfc": first_chunk,
+        "e2e": time.perf_counter() - started,
+        "events": events,
+        "bytes": received,
+        "error": error
+    }
+
+
+async def drive(app_url: str, sessions: int, turns: int) -> Dict[str, Any]:
+    """
+    Run sessions concurrently, each sending its turns one after another
+    """
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    results: List[Dict[str, Any]] = []
+
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120)) as client:
+        async def session(number: int) -> None:
+            for turn in range(turns):
+                query = SCENARIOS[(number + turn) % len(SCENARIOS)]
+                results.append(await run_query(client, f"{app_url}/query", f"bench-{number}", query))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(session(number) for number in range(sessions)))
+        wall = time.perf_counter() - started
+
+    ttfc = [result["ttfc"] * 1000 for result in results if result["ttfc"] is not None]
+    e2e = [result["e2e"] * 1000 for result in results if result["error"] is None]
+    events = sum(result["events"] for result in results)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for result in results if result["error"] is not None),
+        "wall_seconds": round(wall, 2),
+        "ttfc_p50_ms": percentile(ttfc, 0.50),
+        "ttfc_p95_ms": percentile(ttfc, 0.95),
+        "ttfc_p99_ms": percentile(ttfc, 0.99),
+        "e2e_p50_ms": percentile(e2e, 0.50),
+        "e2e_p95_ms": percentile(e2e, 0.95),
+        "e2e_p99_ms": percentile(e2e, 0.99),
+        "requests_per_second": round(len(results) / wall, 2),
+        "events_per_second": round(events / wall, 1),
+        "bytes_per_request": round(sum(result["bytes"] for result in results) / max(len(results), 1))
+    }
+
+
+async def sample_rss(pid: int, samples: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        value = rss_mb(pid)
+        if value is not None:
+            samples.append(value)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.2)
+        except asyncio.TimeoutError:
+            pass
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    stub_port, app_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    stub_env = {
+        "STUB_FIRST_TOKEN_MS": str(args.first_token_ms),
+        "STUB_TOKEN_MS": str(args.token_ms),
+        "STUB_REPLY_WORDS": str(args.reply_words),
+        "STUB_WEATHER_MS": str(args.weather_ms),
+        "STUB_RATE_LIMIT_RATE": str(args.rate_limit_rate)
+    }
+    database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    database.close()
+    app_env = {
+        "GROQ_API_KEY": "bench",
+        "GROQ_BASE_URL": stub_url,
+        "OPENWEATHERMAP_API_KEY": "bench",
+        "OPENWEATHERMAP_BASE_URL": f"{stub_url}/data/2.5/weather",
+        "OPENWEATHERMAP_GEOCODING_URL": f"{stub_url}/geo/1.0/direct",
+        "APPOINTMENT_DB_PATH": database.name,
+        "STREAM_RESPONSES": "true" if args.mode == "stream" else "false",
+        "LOG_LEVEL": "WARNING"
+    }
+
+    stub = start_server("bench.stub_server:app", stub_port, stub_env)
+    app = None
+    try:
+        await wait_until_ready(f"{stub_url}/docs", stub)
+        app = start_server("main:app", app_port, app_env)
+        await wait_until_ready(f"{app_url}/readyz", app)
+
+        rss_samples: List[float] = []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_rss(app.pid, rss_samples, stop))
+        summary = await drive(app_url, args.sessions, args.turns)
+        stop.set()
+        await sampler
+    finally:
+        for process in (app, stub):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(database.name + suffix):
+                os.unlink(database.name + suffix)
+
+    summary["rss_peak_mb"] = max(rss_samples) if rss_samples else None
+    summary["rss_end_mb"] = rss_samples[-1] if rss_samples else None
+    return {
+        "label": args.label,
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "mode": args.mode,
+            "sessions": args.sessions,
+            "turns": args.turns,
+            **{key.lower(): value for key, value in stub_env.items()}
+        },
+        "results": summary
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    results = report["results"]
+    print(f"{report['label']} @ {report['revision']}: {results['requests']} requests in {results['wall_seconds']}s")
+    if baseline is not None and baseline["config"] != report["config"]:
+        print(f"Note: baseline {baseline['label']} was run with a different configuration: {baseline['config']}")
+    header = f"{'metric':<22}{'value':>12}"
+    if baseline is not None:
+        header += f"{'baseline':>12}{'change':>10}"
+    print(header)
+    for metric, higher_is_better in METRICS.items():
+        value = results.get(metric)
+        line = f"{metric:<22}{value if value is not None else '-':>12}"
+        if baseline is not None:
+            previous = baseline["results"].get(metric)
+            change = ""
+            if value is not None and previous:
+                delta = (value - previous) / previous * 100
+                worse = delta < 0 if higher_is_better else delta > 0
+                change = f"{delta:+.1f}%{' !' if worse and abs(delta) >= 10 else ''}"
+            line += f"{previous if previous is not None else '-':>12}{change:>10}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test for /query")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent SSE sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Sequential queries per session")
+    parser.add_argument("--mode", choices=["stream", "complete"], default="stream", help="STREAM_RESPONSES setting of the app")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Stub latency before the first token")
+    parser.add_argument("--token-ms", type=float, default=20, help="Stub delay between tokens")
+    parser.add_argument("--reply-words", type=int, default=40, help="Words in a reply without tool calls")
+    parser.add_argument("--weather-ms", type=float, default=80, help="Stub weather and geocoding latency")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="Fraction of completions answered with 429")
+    parser.add_argument("--label", default="run", help="Name of the result file in bench/results/")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+
+    report = asyncio.run(benchmark(args))
+    print_report(report, baseline)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{args.label}.json")
+    with open(path, "w") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
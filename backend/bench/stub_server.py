@@ -0,0 +1,135 @@
+import asyncio
+import datetime
+import json
+import os
+import random
+from typing import Any, Dict, List, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Stand-in latencies, set by bench/run.py through the environment
+STUB_FIRST_TOKEN_MS = float(os.getenv("STUB_FIRST_TOKEN_MS", "300"))
+STUB_TOKEN_MS = float(os.getenv("STUB_TOKEN_MS", "20"))
+STUB_REPLY_WORDS = int(os.getenv("STUB_REPLY_WORDS", "40"))
+STUB_WEATHER_MS = float(os.getenv("STUB_WEATHER_MS", "80"))
+# Fraction of requests answered with a 429, to exercise admission control
+STUB_RATE_LIMIT_RATE = float(os.getenv("STUB_RATE_LIMIT_RATE", "0"))
+
+WORDS = (
+    "our latest models combine sharp handling with a comfortable cabin and "
+    "plenty of room for the whole family so a test drive is the best way to feel the difference"
+).split()
+
+CITIES = ["New York", "Los Angeles", "Chicago", "Miami", "Seattle", "Denver", "Austin", "Boston"]
+DEALERSHIPS = ["supercar_nyc", "supercar_la", "LEX001", "D123"]
+
+app = FastAPI(title="Groq and OpenWeatherMap stand-in")
+
+
+def _plan_reply(body: Dict[str, Any]) -> Tuple[str, List[Tuple[str, Dict[str, Any]]]]:
+    """
+    Pick the reply text and tool calls from keywords in the last user message
+    """
+    users = [message for message in body["messages"] if message["role"] == "user"]
+    query = (users[-1]["content"] if users else "").lower()
+    text = " ".join(WORDS[i % len(WORDS)] for i in range(STUB_REPLY_WORDS))
+
+    tools = []
+    if "weather" in query:
+        tools.append(("get_weather", {"city": random.choice(CITIES)}))
+    if "address" in query:
+        tools.append(("get_dealership_address", {"dealership_id": random.choice(DEALERSHIPS)}))
+    if "nearest" in query:
+        tools.append(("find_nearest_dealership", {"location": random.choice(CITIES)}))
+    if "available" in query:
+        date = (datetime.date.today() + datetime.timedelta(days=random.randint(1, 14))).isoformat()
+        tools.append(("check_appointment_availability", {"dealership_id": random.choice(DEALERSHIPS), "date": date}))
+    if tools:
+        # The model usually says little when it calls tools
+        text = " ".join(text.split()[:8])
+    return text, tools
+
+
+def _chunk(model: str, delta: Dict[str, Any], finish_reason: Any = None) -> str:
+    payload = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": model,
+        "system_fingerprint": "bench",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}]
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if STUB_RATE_LIMIT_RATE and random.random() < STUB_RATE_LIMIT_RATE:
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests"}},
+            status_code=429,
+            headers={"retry-after": "1"}
+        )
+
+    text, tools = _plan_reply(body)
+    model = body["model"]
+    words = text.split()
+
+    if not body.get("stream"):
+        await asyncio.sleep((STUB_FIRST_TOKEN_MS + STUB_TOKEN_MS * len(words)) / 1000)
+        message: Dict[str, Any] = {"role": "assistant", "content": text}
+        if tools:
+            message["tool_calls"] = [
+                {"id": f"call_{index}", "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+                for index, (name, args) in enumerate(tools)
+            ]
+        return JSONResponse({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": model,
+            "system_fingerprint": "bench",
+            "choices": [{"index": 0, "finish_reason": "tool_calls" if tools else "stop", "logprobs": None, "message": message}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": len(words), "total_tokens": 100 + len(words)}
+        })
+
+    async def events():
+        await asyncio.sleep(STUB_FIRST_TOKEN_MS / 1000)
+        for word in words:
+            yield _chunk(model, {"role": "assistant", "content": word + " "})
+            await asyncio.sleep(STUB_TOKEN_MS / 1000)
+        for index, (name, args) in enumerate(tools):
+            arguments = json.dumps(args)
+            # Arguments arrive split across chunks, as they do from the real API
+            half = len(arguments) // 2
+            yield _chunk(model, {"tool_calls": [{"index": index, "id": f"call_{index}", "type": "function", "function": {"name": name, "arguments": arguments[:half]}}]})
+            yield _chunk(model, {"tool_calls": [{"index": index, "function": {"arguments": arguments[half:]}}]})
+        yield _chunk(model, {}, "tool_calls" if tools else "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/data/2.5/weather")
+async def weather(q: str, appid: str, units: str = "metric"):
+    await asyncio.sleep(STUB_WEATHER_MS / 1000)
+    return {
+        "main": {"temp": 20 + len(q) % 10, "humidity": 55},
+        "weather": [{"description": "clear sky"}],
+        "wind": {"speed": 3.4},
+        "name": q,
+        "sys": {"country": "US"}
+    }
+
+
+@app.get("/geo/1.0/direct")
+async def geocode(q: str, appid: str, limit: int = 1):
+    await asyncio.sleep(STUB_WEATHER_MS / 1000)
+    return [{"name": q, "lat": 39.7392, "lon": -104.9903, "country": "US"}]
+
+
+@app.get("/openai/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "llama-3.3-70b-versatile", "object": "model", "created": 0, "owned_by": "bench"}]}
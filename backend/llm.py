@@ -1,13 +1,211 @@
 import os
-from groq import Groq
-from typing import List, Dict, Any
+import asyncio
+import hashlib
+import logging
+import time
+import httpx
+from contextlib import aclosing
+from groq import AsyncGroq, APIConnectionError, APIStatusError
+from typing import List, Dict, Any, AsyncGenerator, Optional, Tuple
 from dotenv import load_dotenv
 import json
-from datetime import datetime
+
+from tools.registry import ToolResult, registry
+from utils.admission import AdmissionController, PRIORITY_IN_PROGRESS, PRIORITY_NEW
+from utils.cache import AsyncTTLCache
+from utils.log import log_payload
+from utils.cancellation import STAGE_LLM, STAGE_TOOLS, enter_stage
+from utils.metrics import CANCELLED_WORK, ERRORS, FALLBACKS, LLM_COMPLETION_SECONDS, TOOL_SECONDS
+from utils.prefetch import PrefetchBatch, ToolPrefetcher
+from utils.routing import ModelRouter
+# Importing the tool modules registers them
+from tools import weather, dealership, appointment  # noqa: F401
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Model used for every completion unless routing picks the fast one
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+GROQ_FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+
+# Latency-based routing: simple turns to the fast model, slow calls hedged
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "false").lower() == "true"
+LLM_ROUTING_SIMPLE_MAX_WORDS = int(os.getenv("LLM_ROUTING_SIMPLE_MAX_WORDS", "12"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+# Empty races the other tier: the fast model against the default and vice versa
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL", "")
+LLM_HEDGE_DELAY_MS = float(os.getenv("LLM_HEDGE_DELAY_MS", "1500"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "250"))
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+
+# LLM client limits
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Upstream admission control: provider quota, wait queue, backoff and circuit breaker
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+LLM_QUEUE_MAX_WAITING = int(os.getenv("LLM_QUEUE_MAX_WAITING", "256"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Tool execution limits
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+
+# Speculative tool calls predicted from the user's message, run during the completion
+TOOL_PREFETCH_ENABLED = os.getenv("TOOL_PREFETCH_ENABLED", "false").lower() == "true"
+TOOL_PREFETCH_MAX_CALLS = int(os.getenv("TOOL_PREFETCH_MAX_CALLS", "2"))
+
+# Cache of complete model turns for repeated conversations
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    Rate limits, server errors and connection failures are worth retrying
+    """
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (APIConnectionError, httpx.TransportError))
+
+
+class AsyncLLMClient:
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT
+    ):
+        """
+        Non-blocking Groq client on a pooled keep-alive HTTP transport
+
+        :param api_key: Groq API key
+        :param max_concurrency: Maximum number of in-flight completions
+        :param timeout: Per-call deadline in seconds, including time spent
+                        queued for admission, backing off and waiting for a
+                        concurrency slot
+        """
+        self.timeout = timeout
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT)
+        )
+        # Retries are handled by the admission controller so they share its
+        # rate limit and circuit breaker instead of bypassing them
+        self.client = AsyncGroq(
+            api_key=api_key,
+            http_client=self.http_client,
+            max_retries=0
+        )
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.admission = AdmissionController(
+            rate_per_minute=LLM_RATE_LIMIT_RPM,
+            burst=LLM_RATE_LIMIT_BURST,
+            max_waiting=LLM_QUEUE_MAX_WAITING,
+            max_retries=LLM_MAX_RETRIES,
+            retry_base_delay=LLM_RETRY_BASE_DELAY,
+            retry_max_delay=LLM_RETRY_MAX_DELAY,
+            failure_threshold=LLM_BREAKER_THRESHOLD,
+            cooldown=LLM_BREAKER_COOLDOWN,
+            is_retryable=_is_retryable
+        )
+
+    async def complete(self, priority: int = PRIORITY_NEW, **params) -> Any:
+        """
+        Run a non-streaming chat completion
+
+        :param priority: Admission priority; in-progress conversations go first
+        :param params: Keyword arguments for chat.completions.create
+        :return: ChatCompletion response
+        """
+        async def _attempt():
+            async with self._slots:
+                return await self.client.chat.completions.create(stream=False, **params)
+
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(self.admission.call(_attempt, priority), self.timeout)
+        finally:
+            LLM_COMPLETION_SECONDS.labels("complete").observe(time.perf_counter() - started)
+
+    async def stream(self, priority: int = PRIORITY_NEW, **params) -> AsyncGenerator[Any, None]:
+        """
+        Run a streaming chat completion, holding a concurrency slot until the
+        stream is exhausted or closed
+
+        Only opening the stream is retried; once chunks flow, errors propagate.
+
+        :param priority: Admission priority; in-progress conversations go first
+        :param params: Keyword arguments for chat.completions.create
+        :return: Async generator of ChatCompletionChunk objects
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.timeout
+
+        async def _attempt():
+            await self._slots.acquire()
+            try:
+                return await self.client.chat.completions.create(stream=True, **params)
+            except BaseException:
+                self._slots.release()
+                raise
+
+        try:
+            stream = await asyncio.wait_for(self.admission.call(_attempt, priority), self.timeout)
+        except BaseException:
+            LLM_COMPLETION_SECONDS.labels("stream").observe(loop.time() - started)
+            raise
+        try:
+            try:
+                async for chunk in stream:
+                    if loop.time() > deadline:
+                        raise asyncio.TimeoutError("LLM stream exceeded its deadline")
+                    yield chunk
+            finally:
+                await stream.response.aclose()
+        finally:
+            self._slots.release()
+            LLM_COMPLETION_SECONDS.labels("stream").observe(loop.time() - started)
+
+    def admission_stats(self) -> Dict[str, Any]:
+        return self.admission.stats()
+
+    async def prewarm(self) -> None:
+        """
+        Open a pooled connection to Groq before the first request needs it
+
+        Listing models costs no tokens and checks the API key on the way;
+        any other status still leaves a warm connection in the pool.
+        """
+        try:
+            await self.client.models.list()
+        except APIStatusError as e:
+            if e.status_code in (401, 403):
+                raise
+
+    async def aclose(self) -> None:
+        """
+        Close the pooled HTTP transport
+        """
+        await self.http_client.aclose()
+
 class GroqAssistant:
     def __init__(self):
         """
@@ -17,99 +215,27 @@ class GroqAssistant:
         if not api_key:
             raise ValueError("Groq API key not found in environment variables")
         
-        self.client = Groq(api_key=api_key)
+        self.llm = AsyncLLMClient(api_key)
+        self.router = ModelRouter(
+            model=GROQ_MODEL,
+            fast_model=GROQ_FAST_MODEL,
+            hedge_model=LLM_HEDGE_MODEL,
+            routing_enabled=LLM_ROUTING_ENABLED,
+            simple_max_words=LLM_ROUTING_SIMPLE_MAX_WORDS,
+            hedge_enabled=LLM_HEDGE_ENABLED,
+            hedge_delay=LLM_HEDGE_DELAY_MS / 1000,
+            hedge_min_delay=LLM_HEDGE_MIN_DELAY_MS / 1000,
+            hedge_percentile=LLM_HEDGE_PERCENTILE
+        )
         
-        # Define available tools
-        self.tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_weather",
-                    "description": "Get current weather for a specified city",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "city": {
-                                "type": "string", 
-                                "description": "Name of the city to get weather for"
-                            }
-                        },
-                        "required": ["city"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_dealership_address",
-                    "description": "Retrieve address for a specific dealership",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "dealership_id": {
-                                "type": "string", 
-                                "description": "Unique identifier for the dealership"
-                            }
-                        },
-                        "required": ["dealership_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "check_appointment_availability",
-                    "description": "Check available appointment slots for a dealership on a specific date",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "dealership_id": {
-                                "type": "string", 
-                                "description": "Unique identifier for the dealership"
-                            },
-                            "date": {
-                                "type": "string", 
-                                "description": "Date to check availability (YYYY-MM-DD format)"
-                            }
-                        },
-                        "required": ["dealership_id", "date"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "schedule_appointment",
-                    "description": "Schedule a test drive appointment",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {
-                                "type": "string", 
-                                "description": "Unique identifier for the user"
-                            },
-                            "dealership_id": {
-                                "type": "string", 
-                                "description": "Unique identifier for the dealership"
-                            },
-                            "date": {
-                                "type": "string", 
-                                "description": "Appointment date (YYYY-MM-DD format)"
-                            },
-                            "time": {
-                                "type": "string", 
-                                "description": "Appointment time (HH:MM format)"
-                            },
-                            "car_model": {
-                                "type": "string", 
-                                "description": "Car model for the test drive"
-                            }
-                        },
-                        "required": ["user_id", "dealership_id", "date", "time", "car_model"]
-                    }
-                }
-            }
-        ]
+        # Tool schemas are generated once by the registry
+        self.tools = registry.schemas()
+        self.prefetcher = ToolPrefetcher(enabled=TOOL_PREFETCH_ENABLED, max_calls=TOOL_PREFETCH_MAX_CALLS)
+
+        # Optional cache of complete turns, keyed on the normalized conversation
+        self.response_cache: Optional[AsyncTTLCache] = None
+        if RESPONSE_CACHE_ENABLED:
+            self.response_cache = AsyncTTLCache(max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
     
     async def generate_response(self, messages: List[Dict[str, str]], session_id: str) -> Dict[str, Any]:
         """
@@ -119,99 +245,317 @@ class GroqAssistant:
         :param session_id: Unique session identifier
         :return: Dictionary with response details
         """
+        cache_key = self._response_cache_key(messages)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return {"content": cached["content"], "tool_outputs": list(cached["tool_outputs"])}
+
+        priority = self._priority(messages)
+        _, model = self.router.route(messages)
+        enter_stage(STAGE_LLM)
+        ai_message = None
+        prefetched = self.prefetcher.start(messages, self._generate_tool_output)
+
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=messages,
-                tools=self.tools,
-                tool_choice="auto",
-                stream=False  # We'll handle streaming separately
+            response = await self.router.call(
+                lambda name: self.llm.complete(
+                    priority=priority,
+                    model=name,
+                    messages=messages,
+                    tools=self.tools,
+                    tool_choice="auto"
+                ),
+                model
             )
             
             # Extract response details
             ai_message = response.choices[0].message
 
-            print("ai_message",ai_message)
+            log_payload(logger, "Model message", ai_message)
 
             # Process tool calls 
             processed_tool_calls = []
             if ai_message.tool_calls:
-                for tool_call in ai_message.tool_calls:
-                    tool_name = tool_call.function.name
-                    
-                    # Parse function arguments
-                    try:
-                        function_args = json.loads(tool_call.function.arguments)
-                    except json.JSONDecodeError:
-                        function_args = {}
-                    
-                    tool_output = await self._generate_tool_output(tool_name, function_args)
-                    
-                    processed_tool_calls.append({
-                        "name": tool_name,
-                        "output": tool_output
-                    })
+                calls = [
+                    (tool_call.function.name, tool_call.function.arguments)
+                    for tool_call in ai_message.tool_calls
+                ]
+                results = [None] * len(calls)
+                async for index, tool_output in self._execute_tool_calls(calls, prefetched):
+                    results[index] = tool_output
+                processed_tool_calls = results
             
+            self._store_response(cache_key, ai_message.content or "", processed_tool_calls)
             return {
                 "content": ai_message.content or "",
                 "tool_outputs": processed_tool_calls
             }
         
+        except asyncio.CancelledError:
+            # The caller gave up; the model call or tool calls in flight were stopped
+            if ai_message is None:
+                CANCELLED_WORK.labels("llm").inc()
+            raise
         except Exception as e:
-            print(f"Error in Groq API call: {e}")
-            print(f"Error type: {type(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
-            print(f"Messages: {messages}")
+            ERRORS.labels("llm").inc()
+            FALLBACKS.labels("llm_apology").inc()
+            logger.exception("Error in Groq API call: %s", e, extra={"messages": len(messages)})
+            log_payload(logger, "Messages of the failed call", messages)
             return {
                 "content": "I apologize, but I'm unable to process your request at the moment.",
                 "tool_outputs": []
             }
+        finally:
+            if prefetched is not None:
+                prefetched.close()
+
+    async def stream_response(self, messages: List[Dict[str, str]], session_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Stream a response from Groq API, forwarding text deltas as they arrive
+
+        Tool-call fragments are collected across chunks and the tools are run
+        once the model has finished emitting their arguments.
+
+        :param messages: List of message dictionaries
+        :param session_id: Unique session identifier
+        :return: Async generator of {"type": "chunk", "data": str} and
+                 {"type": "tool_output", "index": int, "name": str, "output": Any}
+                 items; tool outputs arrive in completion order and carry the
+                 position of the call in the model's response
+        """
+        cache_key = self._response_cache_key(messages)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            # Replay the cached turn without a model round-trip
+            if cached["content"]:
+                yield {"type": "chunk", "data": cached["content"]}
+            for index, tool_output in enumerate(cached["tool_outputs"]):
+                yield {"type": "tool_output", "index": index, **tool_output}
+            return
+
+        pending_calls: Dict[int, Dict[str, str]] = {}
+        content_parts: List[str] = []
+        streamed_any = False
+
+        priority = self._priority(messages)
+        _, model = self.router.route(messages)
+        enter_stage(STAGE_LLM)
+
+        prefetched = self.prefetcher.start(messages, self._generate_tool_output)
+        try:
+            # aclosing() stops the upstream stream at once if our consumer goes away
+            chunks = self.router.stream(
+                lambda name: self.llm.stream(
+                    priority=priority,
+                    model=name,
+                    messages=messages,
+                    tools=self.tools,
+                    tool_choice="auto"
+                ),
+                model
+            )
+            try:
+                async with aclosing(chunks):
+                    async for chunk in chunks:
+                        if not chunk.choices:
+                            continue
+
+                        delta = chunk.choices[0].delta
+                        if delta.content:
+                            streamed_any = True
+                            content_parts.append(delta.content)
+                            yield {"type": "chunk", "data": delta.content}
+
+                        for tool_call in delta.tool_calls or []:
+                            call = pending_calls.setdefault(tool_call.index, {"name": "", "arguments": ""})
+                            if tool_call.function:
+                                if tool_call.function.name:
+                                    call["name"] += tool_call.function.name
+                                if tool_call.function.arguments:
+                                    call["arguments"] += tool_call.function.arguments
+
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client went away mid-completion; the upstream stream is closed
+                CANCELLED_WORK.labels("llm").inc()
+                raise
+            except Exception as e:
+                ERRORS.labels("llm").inc()
+                logger.error("Error in Groq streaming call: %s", e, extra={"error_type": type(e).__name__})
+                if not streamed_any and not pending_calls:
+                    FALLBACKS.labels("llm_apology").inc()
+                    yield {
+                        "type": "chunk",
+                        "data": "I apologize, but I'm unable to process your request at the moment."
+                    }
+                return
+
+            # Arguments are only complete once the stream is exhausted
+            calls = [
+                (pending_calls[index]["name"], pending_calls[index]["arguments"])
+                for index in sorted(pending_calls)
+            ]
+            tool_outputs = [None] * len(calls)
+            async with aclosing(self._execute_tool_calls(calls, prefetched)) as results:
+                async for index, tool_output in results:
+                    tool_outputs[index] = tool_output
+                    yield {"type": "tool_output", "index": index, **tool_output}
+
+            self._store_response(cache_key, "".join(content_parts), tool_outputs)
+        finally:
+            if prefetched is not None:
+                prefetched.close()
 
-    async def _generate_tool_output(self, tool_name: str, args: Dict[str, Any]) -> Any:
+    def routing_stats(self) -> Dict[str, Any]:
+        return self.router.stats()
+
+    def prefetch_stats(self) -> Dict[str, Any]:
+        return self.prefetcher.stats()
+
+    def response_cache_stats(self) -> Optional[Dict[str, int]]:
         """
-        Generate tool outputs using actual tool implementations
+        Return hit/miss counters for the response cache, if enabled
         """
-        from tools.weather import WeatherTool
-        from tools.dealership import DealershipTool
-        from tools.appointment import AppointmentTool
-        
+        return self.response_cache.stats() if self.response_cache is not None else None
+
+    @staticmethod
+    def _priority(messages: List[Dict[str, str]]) -> int:
+        """
+        Serve conversations that already have a reply ahead of new ones
+        """
+        if any(message["role"] == "assistant" for message in messages):
+            return PRIORITY_IN_PROGRESS
+        return PRIORITY_NEW
+
+    def _response_cache_key(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Hash the normalized conversation together with the model and tool schema version
+        """
+        if self.response_cache is None:
+            return None
+        normalized = [
+            (message["role"], " ".join((message.get("content") or "").split()).casefold().rstrip("?!. "))
+            for message in messages
+        ]
+        payload = json.dumps([GROQ_MODEL, registry.schema_version(), normalized], separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _cached_response(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if cache_key is None:
+            return None
+        return self.response_cache.get(cache_key)
+
+    def _store_response(self, cache_key: Optional[str], content: str, tool_outputs: List[Dict[str, Any]]) -> None:
+        """
+        Cache a completed turn unless it used a tool that must always run or
+        a tool returned an error or fallback output
+        """
+        if cache_key is None or not (content or tool_outputs):
+            return
+        if any(tool_output.get("is_error") for tool_output in tool_outputs):
+            return
+        if all(registry.is_cacheable(tool_output["name"]) for tool_output in tool_outputs):
+            self.response_cache.set(cache_key, {"content": content, "tool_outputs": tool_outputs})
+
+    async def prewarm(self) -> None:
+        await self.llm.prewarm()
+
+    async def aclose(self) -> None:
+        """
+        Release the underlying LLM client connections
+        """
+        await self.llm.aclose()
+
+    async def _execute_tool_calls(
+        self,
+        calls: List[Tuple[str, str]],
+        prefetched: Optional[PrefetchBatch] = None
+    ) -> AsyncGenerator[Tuple[int, Dict[str, Any]], None]:
+        """
+        Run the tool calls of one model turn concurrently
+
+        Fan-out is bounded by TOOL_MAX_CONCURRENCY and each call is limited
+        to TOOL_TIMEOUT seconds.
+
+        :param calls: (tool name, raw JSON arguments) pairs in the model's order
+        :param prefetched: Speculative calls started with the completion
+        :return: Async generator of (index, tool output) pairs in completion order
+        """
+        slots = asyncio.Semaphore(TOOL_MAX_CONCURRENCY)
+        enter_stage(STAGE_TOOLS)
+
+        async def _run(index: int, tool_name: str, raw_arguments: str) -> Tuple[int, Dict[str, Any]]:
+            async with slots:
+                try:
+                    return index, await asyncio.wait_for(
+                        self._run_tool_call(tool_name, raw_arguments, prefetched),
+                        TOOL_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    ERRORS.labels("tool").inc()
+                    FALLBACKS.labels("tool_timeout").inc()
+                    logger.warning("Tool %s timed out after %ss", tool_name, TOOL_TIMEOUT)
+                    return index, {
+                        "name": tool_name,
+                        "output": f"The {tool_name} tool took too long to respond. Please try again.",
+                        "is_error": True
+                    }
+
+        tasks = [
+            asyncio.create_task(_run(index, tool_name, raw_arguments))
+            for index, (tool_name, raw_arguments) in enumerate(calls)
+        ]
         try:
-            if tool_name == "get_weather":
-                result = await WeatherTool.get_weather(args.get('city', 'New York'))
-                return f"The current weather in {args.get('city', 'the area')} is {result['temperature']}, {result['description']} with humidity at {result['humidity']}%."
-                
-            elif tool_name == "get_dealership_address":
-                result = await DealershipTool.get_dealership_address(args.get('dealership_id', 'supercar_nyc'))
-                if "error" in result:
-                    return f"Sorry, we couldn't find information for dealership {args.get('dealership_id', '')}."
-                return f"Our dealership is located at {result['address']}. You can contact us at {result['phone']}."
-                
-            elif tool_name == "check_appointment_availability":
-                result = await AppointmentTool.check_appointment_availability(
-                    args.get('dealership_id', 'LEX001'), 
-                    args.get('date', datetime.now().strftime("%Y-%m-%d"))
-                )
-                if "error" in result:
-                    return result["error"]
-                available_slots = sum(1 for slot in result["slots"] if slot["available"])
-                return f"We have {available_slots} available slots on {result['date']} at our {result['dealership_id']} location."
-                
-            elif tool_name == "schedule_appointment":
-                result = await AppointmentTool.schedule_appointment(
-                    args.get('user_id', 'user123'),
-                    args.get('dealership_id', 'LEX001'),
-                    args.get('date', datetime.now().strftime("%Y-%m-%d")),
-                    args.get('time', '10:00'),
-                    args.get('car_model', 'Luxury Model')
-                )
-                if "error" in result:
-                    return result["error"]
-                return f"Appointment scheduled for {result['car_model']} on {result['date']} at {result['time']}. Your booking ID is {result['booking_id']}."
-            
-            else:
-                return f"Tool {tool_name} executed successfully."
-                
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                # Only reached early when the consumer stopped reading
+                CANCELLED_WORK.labels("tool").inc(len(unfinished))
+
+    async def _run_tool_call(
+        self,
+        tool_name: str,
+        raw_arguments: str,
+        prefetched: Optional[PrefetchBatch] = None
+    ) -> Dict[str, Any]:
+        """
+        Parse the JSON arguments of a tool call and execute it
+
+        A matching speculative call is awaited instead of running the tool again.
+
+        :param tool_name: Name of the tool requested by the model
+        :param raw_arguments: JSON-encoded arguments string from the model
+        :param prefetched: Speculative calls started with the completion
+        :return: Dictionary with the tool name, its output and whether it is an error
+        """
+        try:
+            function_args = json.loads(raw_arguments or "{}")
+        except json.JSONDecodeError:
+            function_args = {}
+
+        task = prefetched.claim(tool_name, function_args) if prefetched is not None else None
+        if task is not None:
+            result = await task
+        else:
+            result = await self._generate_tool_output(tool_name, function_args)
+        return {"name": tool_name, "output": result.output, "is_error": result.is_error}
+
+    async def _generate_tool_output(self, tool_name: str, args: Dict[str, Any]) -> ToolResult:
+        """
+        Generate tool outputs using the registered tool implementations
+        """
+        started = time.perf_counter()
+        try:
+            return await registry.execute(tool_name, args)
         except Exception as e:
-            print(f"Error executing tool {tool_name}: {e}")
-            return f"There was an error executing the {tool_name} tool. Please try again."
\ No newline at end of file
+            ERRORS.labels("tool").inc()
+            FALLBACKS.labels("tool_error").inc()
+            logger.exception("Error executing tool %s: %s", tool_name, e)
+            return ToolResult(f"There was an error executing the {tool_name} tool. Please try again.", is_error=True)
+        finally:
+            # Unknown names come from the model; keep them out of the label set
+            label = tool_name if registry.get(tool_name) is not None else "unknown"
+            TOOL_SECONDS.labels(label).observe(time.perf_counter() - started)
@@ -1,24 +1,168 @@
 import os
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from sse_starlette.sse import EventSourceResponse
 import asyncio
 import json
+import logging
+import time
+import uuid
+from contextlib import aclosing, asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Dict, List, Optional
 
-from utils.stream import StreamHelper
-from models import QueryRequest
-from llm import GroqAssistant
+from utils.stream import HEARTBEAT_FRAME, StreamHelper
+from models import BatchQueryRequest, QueryRequest
+from utils.http_client import ToolHTTPClient
+from utils.conversation_store import ConversationStore, SQLiteConversationStore
+from utils.context import ContextBuilder
+from utils.session_gate import SessionGate, SessionQueueFull
+from utils.cancellation import STAGE_STREAM, RequestScope, enter_stage
+from utils.lifecycle import StartupTracker
+from utils.replay import ReplayBuffer, ResponseLog, ResumeGap
+from utils.log import LogPipeline, bind_request, elapsed_ms, log_payload, sampled
+from utils.metrics import metrics, ACTIVE_STREAMS, ERRORS, QUERY_EVENTS, QUERY_FIRST_EVENT_SECONDS
+from tools.weather import WeatherTool, OPENWEATHERMAP_BASE_URL
+from tools.appointment import AppointmentTool
+from tools.dealership import DealershipTool, OPENWEATHERMAP_GEOCODING_URL
+
+if TYPE_CHECKING:
+    from llm import GroqAssistant
 
 # Load environment variables
 load_dotenv()
 
+# JSON logs written by a background thread
+LogPipeline.start()
+logger = logging.getLogger(__name__)
+
+# Forward model deltas as they arrive instead of replaying a finished reply
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+
+# Conversation store limits
+SYSTEM_PROMPT = "You are a helpful car sales assistant named Lex."
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", "3600"))
+CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# "memory" keeps history in this process; "sqlite" shares it between workers
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "memory").lower()
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", "conversations.db")
+CONVERSATION_CACHE_SESSIONS = int(os.getenv("CONVERSATION_CACHE_SESSIONS", "1000"))
+
+# Worker processes when started with "python main.py"
+UVICORN_WORKERS = int(os.getenv("UVICORN_WORKERS", "1"))
+
+# Per-session request queueing
+SESSION_MAX_QUEUE_DEPTH = int(os.getenv("SESSION_MAX_QUEUE_DEPTH", "2"))
+SESSION_COALESCE_DUPLICATES = os.getenv("SESSION_COALESCE_DUPLICATES", "true").lower() == "true"
+
+# Longest a /query response or batch item may take, queueing included
+QUERY_DEADLINE_SECONDS = float(os.getenv("QUERY_DEADLINE_SECONDS", "120"))
+
+# Buffered responses for resuming dropped SSE streams with Last-Event-ID
+SSE_RESUME_TTL = float(os.getenv("SSE_RESUME_TTL", "120"))
+SSE_RESUME_MAX_RESPONSES = int(os.getenv("SSE_RESUME_MAX_RESPONSES", "1000"))
+SSE_RESUME_MAX_FRAMES = int(os.getenv("SSE_RESUME_MAX_FRAMES", "512"))
+SSE_RESUME_GRACE_SECONDS = float(os.getenv("SSE_RESUME_GRACE_SECONDS", "10"))
+
+# Idle streams get heartbeats from the response log each client follows;
+# sse-starlette's own fixed-interval ping is only a fallback
+SSE_KEEPALIVE_PING_INTERVAL = 600
+
+# Bulk processing limits for /query/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Open upstream connections right after startup; /readyz waits for it to finish
+STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "true").lower() == "true"
+STARTUP_PREWARM_TIMEOUT = float(os.getenv("STARTUP_PREWARM_TIMEOUT", "5"))
+
+# Prompt size limits
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "500"))
+CONTEXT_SUMMARY_LINE_CHARS = int(os.getenv("CONTEXT_SUMMARY_LINE_CHARS", "200"))
+
+# Startup timings and dependency status, reported by /healthz and /readyz
+startup = StartupTracker()
+
+# Created by lifespan; stays None when the LLM client cannot be built
+groq_assistant: Optional["GroqAssistant"] = None
+
+
+async def prewarm_upstreams() -> None:
+    """
+    Open pooled connections to Groq and the tool APIs ahead of the first request
+    """
+    async def _warm(name: str, coroutine) -> None:
+        with startup.step(name, required=False):
+            await asyncio.wait_for(coroutine, STARTUP_PREWARM_TIMEOUT)
+
+    await asyncio.gather(
+        _warm("prewarm_llm", groq_assistant.prewarm()),
+        _warm("prewarm_tools", ToolHTTPClient.prewarm([OPENWEATHERMAP_BASE_URL, OPENWEATHERMAP_GEOCODING_URL]))
+    )
+    startup.mark_ready()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build clients and load tool data once on startup, release them on shutdown
+    """
+    global groq_assistant
+    try:
+        with startup.step("llm_client"):
+            # The Groq SDK is the slowest import; loading it here keeps it out of
+            # the supervisor process of a multi-worker start and times it
+            from llm import GroqAssistant
+            groq_assistant = GroqAssistant()
+    except ValueError as e:
+        # Stay up so /healthz answers and /readyz reports why
+        logger.error("LLM client unavailable, /query will answer 503", extra={"error": str(e)})
+
+    with startup.step("tool_http_client"):
+        await ToolHTTPClient.startup()
+    with startup.step("appointments"):
+        await asyncio.to_thread(AppointmentTool.startup)
+    with startup.step("dealerships"):
+        await asyncio.to_thread(DealershipTool.directory)
+
+    sweeper = None
+    if isinstance(conversation_history, SQLiteConversationStore):
+        sweeper = asyncio.create_task(conversation_history.run_sweeper())
+
+    prewarm = None
+    if STARTUP_PREWARM and groq_assistant is not None:
+        startup.expect("prewarm_llm", required=False)
+        startup.expect("prewarm_tools", required=False)
+        prewarm = asyncio.create_task(prewarm_upstreams())
+    startup.mark_ready()
+
+    try:
+        yield
+    finally:
+        startup.draining = True
+        for task in (prewarm, sweeper):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if groq_assistant is not None:
+            await groq_assistant.aclose()
+        await ToolHTTPClient.shutdown()
+        AppointmentTool.shutdown()
+        if isinstance(conversation_history, SQLiteConversationStore):
+            conversation_history.close()
+        LogPipeline.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="SuperCar Virtual Sales Assistant",
     description="Backend API for AI-powered car sales assistant",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -31,11 +175,144 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Groq Assistant
-groq_assistant = GroqAssistant()
+# Conversation history storage, bounded by session count, idle time and bytes
+if CONVERSATION_BACKEND == "sqlite":
+    conversation_history = SQLiteConversationStore(
+        db_path=CONVERSATION_DB_PATH,
+        system_prompt=SYSTEM_PROMPT,
+        max_sessions=CONVERSATION_MAX_SESSIONS,
+        idle_ttl=CONVERSATION_IDLE_TTL,
+        max_bytes=CONVERSATION_MAX_BYTES,
+        cache_sessions=CONVERSATION_CACHE_SESSIONS
+    )
+elif CONVERSATION_BACKEND == "memory":
+    conversation_history = ConversationStore(
+        system_prompt=SYSTEM_PROMPT,
+        max_sessions=CONVERSATION_MAX_SESSIONS,
+        idle_ttl=CONVERSATION_IDLE_TTL,
+        max_bytes=CONVERSATION_MAX_BYTES
+    )
+else:
+    raise ValueError(f"Unknown CONVERSATION_BACKEND: {CONVERSATION_BACKEND}")
+
+# One upstream call at a time per session
+session_gate = SessionGate(
+    max_depth=SESSION_MAX_QUEUE_DEPTH,
+    coalesce=SESSION_COALESCE_DUPLICATES
+)
+
+# Recent responses, replayed to clients that reconnect mid-stream
+replay_buffer = ReplayBuffer(
+    max_responses=SSE_RESUME_MAX_RESPONSES,
+    ttl=SSE_RESUME_TTL,
+    max_frames=SSE_RESUME_MAX_FRAMES,
+    grace=SSE_RESUME_GRACE_SECONDS
+)
+
+# Keeps each prompt within the token budget, summarizing older turns
+context_builder = ContextBuilder(
+    token_budget=CONTEXT_TOKEN_BUDGET,
+    summary_tokens=CONTEXT_SUMMARY_TOKENS,
+    summary_line_chars=CONTEXT_SUMMARY_LINE_CHARS,
+    max_sessions=CONVERSATION_MAX_SESSIONS
+)
+
+
+def require_assistant() -> "GroqAssistant":
+    """
+    Return the LLM assistant, or answer 503 while it is unavailable
+    """
+    if groq_assistant is None:
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is not available"
+        )
+    return groq_assistant
+
+
+async def build_context(session_id: str, query: str) -> List[Dict[str, str]]:
+    """
+    Read the session history, add the new query and fit it into the prompt budget
+
+    Must run while the session is held, so history is current.
+    """
+    session_history = await conversation_history.aget_messages(session_id)
+    session_history.append({"role": "user", "content": query})
+    log_payload(logger, "Conversation history", session_history, messages=len(session_history))
+    return context_builder.build(session_id, session_history)
+
+
+async def save_turn(session_id: str, query: str, response: Dict[str, Any]) -> None:
+    """
+    Record a completed turn in the session history
+    """
+    if response['content'] or response['tool_outputs']:
+        # If there's tool outputs but no content, add a placeholder
+        content_to_save = response['content']
+        if not content_to_save and response['tool_outputs']:
+            content_to_save = "I've processed your request."
+
+        await conversation_history.aappend(session_id, [
+            ("user", query),
+            ("assistant", content_to_save)
+        ])
+
+
+async def observe_stream(
+    frames: AsyncGenerator[bytes, None],
+    received_at: float,
+    route: str = "query"
+) -> AsyncGenerator[bytes, None]:
+    """
+    Send the frames of one SSE response and record time to first event,
+    events sent and active streams
+
+    Heartbeats are sent but not counted, since they carry no content.
+
+    :param frames: Encoded SSE frames of the response
+    :param received_at: time.perf_counter() when the request arrived
+    :param route: "query" or "resume", the label the response is recorded under
+    :return: Async generator of the same frames
+    """
+    active = ACTIVE_STREAMS.labels(route)
+    active.inc()
+    sent = 0
+    try:
+        async for frame in frames:
+            if frame is not HEARTBEAT_FRAME:
+                if sent == 0:
+                    QUERY_FIRST_EVENT_SECONDS.labels(route).observe(time.perf_counter() - received_at)
+                sent += 1
+            yield frame
+    finally:
+        active.dec()
+        QUERY_EVENTS.labels(route).observe(sent)
+
+
+def resumable_frames(
+    events: AsyncGenerator[Dict[str, str], None],
+    session_id: str,
+    request_id: str,
+    upstream: Optional[ResponseLog] = None
+) -> AsyncGenerator[bytes, None]:
+    """
+    Produce a response in the background and follow it from the start
+
+    Every event carries an ID of the form <request_id>-<seq>; a client that
+    loses the connection can continue from its Last-Event-ID via /query/resume.
+    A duplicate request passes the leader's log as upstream so the leader's
+    response keeps running while the duplicate is connected.
+    """
+    log = replay_buffer.open(session_id, request_id, upstream)
+    log.start(StreamHelper.frame_events(events, event_id=log.next_id))
+    return log.follow()
+
 
-# Conversation history storage (in-memory, replace with persistent storage in production)
-conversation_history = {}
+def sse_response(frames: AsyncGenerator[bytes, None], headers: Optional[Dict[str, str]] = None) -> EventSourceResponse:
+    """
+    Send pre-encoded SSE frames; heartbeats come from the framing layer
+    """
+    return EventSourceResponse(frames, headers=headers, sep="\n", ping=SSE_KEEPALIVE_PING_INTERVAL)
 
 
 @app.post("/query")
@@ -43,56 +320,95 @@ async def handle_query(request: QueryRequest):
     """
     Handle incoming queries and manage conversation history
     """
-    # Get or initialize conversation history
+    received_at = time.perf_counter()
     session_id = request.session_id
-    session_history = conversation_history.get(session_id, [
-        {"role": "system", "content": "You are a helpful car sales assistant named Lex."}
-    ])
-    
-    # Add user message to history
-    session_history.append({"role": "user", "content": request.query})
+    request_id = uuid.uuid4().hex[:16]
+    bind_request(session_id, request_id)
+    assistant = require_assistant()
+    # Covers everything this request starts; the response task inherits it
+    scope = RequestScope(QUERY_DEADLINE_SECONDS)
+    scope.bind()
+
+    # Queue behind earlier requests of the same session, or share an identical one in flight
+    try:
+        ticket = session_gate.admit(session_id, request.query, request_id)
+    except SessionQueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests in progress for this session"
+        )
+    if not ticket.leader:
+        upstream = replay_buffer.get(session_id, ticket.leader_request_id)
+        return sse_response(
+            observe_stream(resumable_frames(ticket.replay(), session_id, request_id, upstream), received_at),
+            headers={"X-Request-ID": request_id}
+        )
     
     # Define event generator for streaming response
     async def event_generator():
+        # Runs once earlier requests of this session have finished, so history is current
+        context_messages = await build_context(session_id, request.query)
+
         try:
-            print("session_history", session_history)
-            # Generate response using Groq API
-            try:
-                response = await groq_assistant.generate_response(
-                    messages=session_history, 
+            if STREAM_RESPONSES:
+                content_parts = []
+                tool_outputs = []
+                items = assistant.stream_response(
+                    messages=context_messages,
                     session_id=request.session_id
                 )
-                print("Successfully received response from Groq API")
-            except Exception as api_error:
-                print(f"Error calling Groq API: {api_error}")
-                print(f"Error type: {type(api_error)}")
-                print(f"Error details: {str(api_error)}")
-                raise api_error
-            
-            print("response", response)
-            # Stream text chunks
-            if response['content']:
-                async for event in StreamHelper.chunked_stream(response['content']):
-                    yield event
-            
-            # Handle tool calls
-            if response['tool_outputs']:
-                for tool_output in response['tool_outputs']:
-                    function_name = tool_output['name']
-                    print(f"Sending tool output for {function_name}: {tool_output['output']}")
-                    
-                    # Yield tool use and output events
-                    yield {
-                        "event": "tool_use",
-                        "data": function_name
-                    }
-                    yield {
-                        "event": "tool_output",
-                        "data": json.dumps({
-                            "name": function_name,
-                            "output": tool_output['output']
-                        })
-                    }
+                async with aclosing(items):
+                    async for item in items:
+                        if item["type"] == "chunk":
+                            content_parts.append(item["data"])
+                            yield {
+                                "event": "chunk",
+                                "data": item["data"]
+                            }
+                        else:
+                            tool_outputs.append(item)
+                            async for event in StreamHelper.stream_tool_response(
+                                item["name"],
+                                {"name": item["name"], "output": item["output"]}
+                            ):
+                                yield event
+
+                # Tool events go out in completion order; keep the model's order for history
+                tool_outputs.sort(key=lambda item: item["index"])
+                response = {
+                    "content": "".join(content_parts),
+                    "tool_outputs": tool_outputs
+                }
+            else:
+                # Generate response using Groq API
+                try:
+                    response = await assistant.generate_response(
+                        messages=context_messages, 
+                        session_id=request.session_id
+                    )
+                except Exception as api_error:
+                    logger.error("Error calling Groq API: %s", api_error, extra={"error_type": type(api_error).__name__})
+                    raise api_error
+                
+                log_payload(logger, "Model response", response)
+                enter_stage(STAGE_STREAM)
+                # Stream text chunks
+                if response['content']:
+                    async for event in StreamHelper.chunked_stream(response['content']):
+                        yield event
+                
+                # Handle tool calls
+                if response['tool_outputs']:
+                    for tool_output in response['tool_outputs']:
+                        function_name = tool_output['name']
+                        log_payload(logger, "Sending tool output", tool_output['output'], tool=function_name)
+                        
+                        # Yield tool use and output events
+                        async for event in StreamHelper.stream_tool_response(
+                            function_name,
+                            {"name": function_name, "output": tool_output['output']}
+                        ):
+                            yield event
             
             # Signal end of stream
             yield {
@@ -101,36 +417,202 @@ async def handle_query(request: QueryRequest):
             }
             
             # Update conversation history with assistant's response
-            if response['content'] or response['tool_outputs']:
-                # If there's tool outputs but no content, add a placeholder
-                content_to_save = response['content']
-                if not content_to_save and response['tool_outputs']:
-                    content_to_save = "I've processed your request."
-                
-                session_history.append({
-                    "role": "assistant", 
-                    "content": content_to_save
-                })
-                conversation_history[request.session_id] = session_history
+            await save_turn(session_id, request.query, response)
+
+            if sampled():
+                logger.info(
+                    "Query completed",
+                    extra={"duration_ms": elapsed_ms(received_at), "tools": len(response['tool_outputs'])}
+                )
         
         except Exception as e:
-            print(f"Error in event generator: {e}")
+            ERRORS.labels("query").inc()
+            logger.exception("Error in event generator: %s", e)
             yield {
                 "event": "error",
                 "data": str(e)
             }
     
     # Return streaming response
-    return EventSourceResponse(event_generator())
+    return sse_response(
+        observe_stream(resumable_frames(scope.guard(ticket.run(event_generator())), session_id, request_id), received_at),
+        headers={"X-Request-ID": request_id}
+    )
+
+@app.get("/query/resume")
+async def resume_query(
+    session_id: str,
+    request_id: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Continue a /query response after a dropped connection, without a new model call
+
+    Send the Last-Event-ID of the last event received, or request_id (from
+    the X-Request-ID header) to start over from the first event.
+    """
+    received_at = time.perf_counter()
+    after = 0
+    if last_event_id:
+        event_request_id, _, seq = last_event_id.rpartition("-")
+        if not event_request_id or not seq.isdigit() or request_id not in (None, event_request_id):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid Last-Event-ID"
+            )
+        request_id, after = event_request_id, int(seq)
+    if not request_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Last-Event-ID or request_id is required"
+        )
+    bind_request(session_id, request_id)
+
+    try:
+        frames = replay_buffer.resume(session_id, request_id, after)
+    except ResumeGap:
+        raise HTTPException(
+            status_code=410,
+            detail="The response is no longer buffered from that event; send the query again"
+        )
+    if frames is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No buffered response for this request"
+        )
+    return sse_response(observe_stream(frames, received_at, "resume"), headers={"X-Request-ID": request_id})
+
+@app.post("/query/batch")
+async def handle_batch_query(request: BatchQueryRequest):
+    """
+    Answer many queries over one connection, streamed back as NDJSON in completion order
+
+    Items run concurrently up to BATCH_MAX_CONCURRENCY; items of the same
+    session run one after another in the order given. Each line is either
+    {"index", "session_id", "content", "tool_outputs"} or
+    {"index", "session_id", "error"}.
+    """
+    assistant = require_assistant()
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may contain at most {BATCH_MAX_ITEMS} items"
+        )
+
+    # Group items by session, keeping their order within each session
+    sessions: Dict[str, List[int]] = {}
+    for index, item in enumerate(request.items):
+        sessions.setdefault(item.session_id, []).append(index)
+
+    request_id = uuid.uuid4().hex[:16]
+    slots = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def answer(index: int) -> Dict[str, Any]:
+        item = request.items[index]
+        # Each session runs in its own task, so this only tags that session's records
+        bind_request(item.session_id, request_id)
+        scope = RequestScope(QUERY_DEADLINE_SECONDS)
+        scope.bind()
+        try:
+            async with asyncio.timeout_at(scope.deadline):
+                async with slots, session_gate.hold(item.session_id):
+                    context_messages = await build_context(item.session_id, item.query)
+                    response = await assistant.generate_response(
+                        messages=context_messages,
+                        session_id=item.session_id
+                    )
+                    await save_turn(item.session_id, item.query, response)
+            scope.finished = True
+            return {"index": index, "session_id": item.session_id, **response}
+        except TimeoutError:
+            scope.abandon("deadline")
+            return {"index": index, "session_id": item.session_id, "error": "The response took too long and was stopped."}
+        except asyncio.CancelledError:
+            # The client went away and the batch is being torn down
+            scope.abandon("disconnect")
+            raise
+        except Exception as e:
+            ERRORS.labels("batch").inc()
+            logger.exception("Error answering batch item %d: %s", index, e)
+            return {"index": index, "session_id": item.session_id, "error": str(e)}
+
+    async def run_session(indexes: List[int]) -> None:
+        for index in indexes:
+            await results.put(await answer(index))
+
+    async def lines():
+        workers = [asyncio.create_task(run_session(indexes)) for indexes in sessions.values()]
+        try:
+            for _ in range(len(request.items)):
+                yield json.dumps(await results.get()) + "\n"
+        finally:
+            # Stop outstanding work if the client goes away
+            for worker in workers:
+                worker.cancel()
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"X-Request-ID": request_id}
+    )
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Report hit/miss counters for the backend caches
+    """
+    return {
+        "weather": WeatherTool.cache_stats(),
+        "conversations": await conversation_history.astats(),
+        "responses": groq_assistant.response_cache_stats() if groq_assistant is not None else None,
+        "session_queue": session_gate.stats(),
+        "sse_resume": replay_buffer.stats(),
+        "llm_admission": groq_assistant.llm.admission_stats() if groq_assistant is not None else None,
+        "llm_routing": groq_assistant.routing_stats() if groq_assistant is not None else None,
+        "tool_prefetch": groq_assistant.prefetch_stats() if groq_assistant is not None else None
+    }
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness: the process is up and serving, with startup timings and dependency status
+    """
+    return {"status": "ok", **startup.report()}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: 200 once required dependencies are up and pre-warming has finished, 503 otherwise
+    """
+    report = startup.report()
+    if groq_assistant is not None:
+        report["llm_circuit_state"] = groq_assistant.llm.admission_stats()["circuit_state"]
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Expose request, LLM and tool metrics in the Prometheus text format
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return {
-        "error": exc.detail,
-        "status_code": exc.status_code
-    }
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "error": exc.detail,
+            "status_code": exc.status_code
+        }
+    )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Several workers need an import string, and CONVERSATION_BACKEND=sqlite
+    # so every worker sees the same conversations
+    if UVICORN_WORKERS > 1:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=UVICORN_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
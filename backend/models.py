@@ -7,6 +7,10 @@ class QueryRequest(BaseModel):
     session_id: str = Field(..., min_length=1, max_length=100, 
                             description="Unique identifier for the conversation session")
 
+class BatchQueryRequest(BaseModel):
+    items: List[QueryRequest] = Field(..., min_length=1,
+                                      description="Queries to answer; items of one session run in order")
+
 class ToolOutput(BaseModel):
     name: str
     output: dict
@@ -27,9 +31,34 @@ class AppointmentSlot(BaseModel):
     time: str
     available: bool
 
+class WeatherRequest(BaseModel):
+    city: str = Field(..., description="Name of the city to get weather for")
+
+class DealershipAddressRequest(BaseModel):
+    dealership_id: str = Field(..., description="Unique identifier for the dealership")
+
+class DealershipSearchRequest(BaseModel):
+    query: str = Field(..., description="Dealership name or city to search for")
+
+class NearestDealershipRequest(BaseModel):
+    location: str = Field(..., description="City or place to find the closest dealership to")
+
+class AppointmentAvailabilityRequest(BaseModel):
+    dealership_id: str = Field(..., description="Unique identifier for the dealership")
+    date: str = Field(..., description="Date to check availability (YYYY-MM-DD format)")
+
 class AppointmentBookingRequest(BaseModel):
-    user_id: str
-    dealership_id: str
-    date: str  # YYYY-MM-DD format
-    time: str  # HH:MM format
-    car_model: str
\ No newline at end of file
+    user_id: str = Field(..., description="Unique identifier for the user")
+    dealership_id: str = Field(..., description="Unique identifier for the dealership")
+    date: str = Field(..., description="Appointment date (YYYY-MM-DD format)")
+    time: str = Field(..., description="Appointment time (HH:MM format)")
+    car_model: str = Field(..., description="Car model for the test drive")
+
+class EarliestAppointmentsRequest(BaseModel):
+    car_model: str = Field(..., description="Car model for the test drive")
+    dealership_ids: List[str] = Field(default_factory=list,
+                                      description="Dealership IDs to search; leave empty to search a region")
+    region: str = Field("", description="City or state code (e.g. 'CA') to search when no dealership IDs are given")
+    start_date: str = Field("", description="First date to search (YYYY-MM-DD format); defaults to today")
+    end_date: str = Field("", description="Last date to search (YYYY-MM-DD format); defaults to two weeks after the start")
+    limit: int = Field(3, ge=1, le=10, description="Number of slots to return")
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.admission import AdmissionController, CircuitBreaker
+
+
+class TransientError(Exception):
+    pass
+
+
+def _controller() -> AdmissionController:
+    return AdmissionController(
+        rate_per_minute=600,
+        burst=1,
+        max_waiting=10,
+        max_retries=0,
+        retry_base_delay=0.01,
+        retry_max_delay=0.01,
+        failure_threshold=1,
+        cooldown=0.05,
+        is_retryable=lambda error: isinstance(error, TransientError)
+    )
+
+
+def _open_circuit_with_empty_bucket(controller: AdmissionController) -> None:
+    controller.breaker.record_failure()
+    assert controller.breaker.state == "open"
+    controller.bucket.time_until_available()
+    controller.bucket.take()
+    time.sleep(0.06)
+    # Cooldown is over but no token is left
+    assert controller.breaker.time_until_allowed() == 0
+    assert controller.bucket.time_until_available() > 0
+
+
+def test_time_until_allowed_does_not_claim_the_probe():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.time_until_allowed() == 0
+    assert breaker.time_until_allowed() == 0
+    assert breaker.claim_probe() is True
+    assert breaker.state == "half_open"
+    assert breaker.time_until_allowed() > 0
+
+
+def test_half_open_probe_waits_for_token_and_closes_circuit():
+    async def scenario():
+        controller = _controller()
+        _open_circuit_with_empty_bucket(controller)
+
+        async def attempt():
+            return "ok"
+
+        result = await asyncio.wait_for(controller.call(attempt, priority=1), 1)
+        assert result == "ok"
+        assert controller.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_half_open_probe_failure_reopens_circuit():
+    async def scenario():
+        controller = _controller()
+        _open_circuit_with_empty_bucket(controller)
+
+        async def attempt():
+            raise TransientError("upstream down")
+
+        with pytest.raises(TransientError):
+            await asyncio.wait_for(controller.call(attempt, priority=1), 1)
+        assert controller.breaker.state == "open"
+        assert controller.breaker.opened == 2
+
+        # After the next cooldown another probe is let through
+        time.sleep(0.06)
+
+        async def recovered():
+            return "ok"
+
+        assert await asyncio.wait_for(controller.call(recovered, priority=1), 1) == "ok"
+        assert controller.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_waiters_behind_probe_are_admitted_after_it_succeeds():
+    async def scenario():
+        controller = _controller()
+        _open_circuit_with_empty_bucket(controller)
+
+        async def attempt():
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*(controller.call(attempt, priority=1) for _ in range(3))),
+            2
+        )
+        assert results == ["ok"] * 3
+        assert controller.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_waiters_do_not_fill_the_queue():
+    async def scenario():
+        controller = _controller()
+        controller.max_waiting = 1
+        _open_circuit_with_empty_bucket(controller)
+        controller.breaker.record_failure()
+        assert controller.breaker.time_until_allowed() > 0
+
+        abandoned = asyncio.ensure_future(controller.acquire(priority=1))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await asyncio.sleep(0)
+        assert controller.stats()["waiting"] == 0
+
+        # The live request is queued instead of rejected and admitted once the circuit allows it
+        assert await asyncio.wait_for(controller.acquire(priority=1), 1) is True
+        assert controller.rejected == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,80 @@
+import asyncio
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from tools.inventory import AppointmentInventory
+
+SLOTS = ["09:00", "10:00", "11:00"]
+
+
+def _booking(booking_id: str, day: str, time: str) -> dict:
+    return {
+        "booking_id": booking_id,
+        "user_id": "u1",
+        "dealership_id": "D1",
+        "date": day,
+        "time": time,
+        "car_model": "Roadster"
+    }
+
+
+def test_bookings_from_another_process_are_seen(tmp_path):
+    db_path = str(tmp_path / "appointments.db")
+    day = (date.today() + timedelta(days=1)).isoformat()
+    first = AppointmentInventory(db_path, SLOTS, set())
+    second = AppointmentInventory(db_path, SLOTS, set())
+    first.open()
+    second.open()
+
+    assert asyncio.run(first.book(_booking("b1", day, "09:00"))) is None
+
+    assert [slot["available"] for slot in asyncio.run(second.slots("D1", day))] == [False, True, True]
+    assert asyncio.run(second.earliest_slots(["D1"], [day], limit=1)) == [(day, "10:00", "D1")]
+    assert asyncio.run(second.book(_booking("b2", day, "09:00"))) is not None
+
+    first.close()
+    second.close()
+
+
+def test_earliest_slots_orders_by_day_then_time_then_dealership(tmp_path):
+    inventory = AppointmentInventory(str(tmp_path / "appointments.db"), SLOTS, set())
+    inventory.open()
+    first_day = (date.today() + timedelta(days=1)).isoformat()
+    second_day = (date.today() + timedelta(days=2)).isoformat()
+    inventory.bulk_load([
+        {**_booking(f"b{time}", first_day, time), "dealership_id": "D1"} for time in SLOTS
+    ])
+
+    assert asyncio.run(inventory.earliest_slots(["D1", "D2"], [first_day, second_day], limit=4)) == [
+        (first_day, "09:00", "D2"),
+        (first_day, "10:00", "D2"),
+        (first_day, "11:00", "D2"),
+        (second_day, "09:00", "D1")
+    ]
+    inventory.close()
+
+
+def test_waiting_for_another_writer_does_not_block_the_event_loop(tmp_path):
+    db_path = str(tmp_path / "appointments.db")
+    day = (date.today() + timedelta(days=1)).isoformat()
+    inventory = AppointmentInventory(db_path, SLOTS, set())
+    inventory.open()
+    other = sqlite3.connect(db_path, isolation_level=None)
+
+    async def scenario():
+        # Another process holds the write lock, so the booking waits on the busy timeout
+        other.execute("BEGIN IMMEDIATE")
+        booking = asyncio.ensure_future(inventory.book(_booking("b1", day, "09:00")))
+        await asyncio.sleep(0.1)
+        slots = asyncio.ensure_future(inventory.slots("D1", day))
+        started = time.monotonic()
+        await asyncio.sleep(0.05)
+        assert time.monotonic() - started < 0.5
+        other.execute("ROLLBACK")
+        assert await asyncio.wait_for(booking, 5) is None
+        assert [slot["available"] for slot in await slots] == [False, True, True]
+
+    asyncio.run(scenario())
+    other.close()
+    inventory.close()
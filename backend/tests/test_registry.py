@@ -0,0 +1,38 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from tools.registry import ToolRegistry
+
+
+class CityRequest(BaseModel):
+    city: str
+
+
+async def _lookup(args: CityRequest):
+    if args.city == "Nowhere":
+        return {"error": "City 'Nowhere' not found"}
+    return {"temperature": "20°C"}
+
+
+def _format(args: CityRequest, result):
+    return result.get("error") or f"{args.city}: {result['temperature']}"
+
+
+def _registry() -> ToolRegistry:
+    registry = ToolRegistry()
+    registry.register("get_weather", "Weather", CityRequest, handler=_lookup, formatter=_format)
+    return registry
+
+
+def test_successful_result_is_not_an_error():
+    result = asyncio.run(_registry().execute("get_weather", {"city": "Miami"}))
+    assert result.output == "Miami: 20°C"
+    assert result.is_error is False
+
+
+def test_error_results_are_marked():
+    registry = _registry()
+    assert asyncio.run(registry.execute("get_weather", {"city": "Nowhere"})).is_error
+    assert asyncio.run(registry.execute("get_weather", {})).is_error
+    assert asyncio.run(registry.execute("unknown_tool", {})).is_error
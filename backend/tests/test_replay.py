@@ -0,0 +1,98 @@
+import asyncio
+
+from utils.replay import GAP_FRAME, ReplayBuffer, ResponseLog
+
+
+def _log(max_frames: int) -> ResponseLog:
+    return ResponseLog("s1", "r1", max_frames=max_frames, grace=10)
+
+
+async def _frames(log: ResponseLog, count: int):
+    for _ in range(count):
+        yield f"frame {log.next_id()}".encode()
+
+
+async def _stalled():
+    await asyncio.sleep(10)
+    yield b""
+
+
+def test_slow_reader_receives_every_frame():
+    async def scenario():
+        log = _log(max_frames=4)
+
+        async def read():
+            received = []
+            async for frame in log.follow():
+                received.append(frame)
+                await asyncio.sleep(0.01)
+            return received
+
+        reader = asyncio.ensure_future(read())
+        # Let the reader attach before the producer starts
+        await asyncio.sleep(0)
+        log.start(_frames(log, 10))
+        received = await asyncio.wait_for(reader, 1)
+        assert received == [f"frame r1-{seq}".encode() for seq in range(1, 11)]
+
+    asyncio.run(scenario())
+
+
+def test_reader_behind_the_buffer_gets_a_gap_error():
+    async def scenario():
+        log = _log(max_frames=4)
+        log.start(_frames(log, 10))
+        await asyncio.sleep(0.01)
+        assert log.done
+        received = [frame async for frame in log.follow(after=2)]
+        assert received == [GAP_FRAME]
+        assert log.gaps == 1
+
+    asyncio.run(scenario())
+
+
+def test_reader_leaving_releases_the_producer():
+    async def scenario():
+        log = _log(max_frames=4)
+        reader = log.follow()
+        first = asyncio.ensure_future(reader.__anext__())
+        await asyncio.sleep(0)
+        log.start(_frames(log, 10))
+        assert await asyncio.wait_for(first, 1) == b"frame r1-1"
+        await asyncio.sleep(0.01)
+        # The producer is waiting for the reader to catch up
+        assert not log.done
+        await reader.aclose()
+        await asyncio.sleep(0.01)
+        assert log.done
+        assert log.last_seq() == 10
+
+    asyncio.run(scenario())
+
+
+def test_full_buffer_evicts_finished_responses_and_never_running_ones():
+    async def scenario():
+        buffer = ReplayBuffer(max_responses=2, ttl=60, max_frames=4, grace=10)
+        running = buffer.open("s1", "running")
+        running.start(_stalled())
+        finished = buffer.open("s1", "finished")
+        finished.start(_frames(finished, 1))
+        await asyncio.sleep(0.01)
+
+        buffer.open("s1", "new")
+        assert buffer.get("s1", "finished") is None
+        assert buffer.get("s1", "new") is not None
+        assert not running.done
+
+        # Only running responses are left, so the next one is not buffered
+        buffer.get("s1", "new").start(_stalled())
+        unbuffered = buffer.open("s1", "extra")
+        assert buffer.get("s1", "extra") is None
+        assert buffer.get("s1", "running") is running
+        assert not running.done
+        assert buffer.stats()["unbuffered"] == 1
+        unbuffered.cancel()
+        running.cancel()
+        buffer.get("s1", "new").cancel()
+
+    asyncio.run(scenario())
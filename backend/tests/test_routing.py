@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from utils.routing import ModelRouter
+
+
+def _router() -> ModelRouter:
+    return ModelRouter(
+        model="full",
+        fast_model="fast",
+        hedge_model="fast",
+        routing_enabled=False,
+        simple_max_words=5,
+        hedge_enabled=True,
+        hedge_delay=0.01,
+        hedge_min_delay=0.01,
+        hedge_percentile=0.9
+    )
+
+
+def test_cancellation_while_losers_shut_down_reaches_the_caller():
+    async def scenario():
+        router = _router()
+        loser_cancelled = asyncio.Event()
+
+        async def attempt(name):
+            if name == "fast":
+                return "hedge"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                # A slow shutdown keeps the race in its cleanup
+                loser_cancelled.set()
+                await asyncio.sleep(0.1)
+                raise
+
+        task = asyncio.ensure_future(router.call(attempt, "full"))
+        await asyncio.wait_for(loser_cancelled.wait(), 1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, 1)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_loser_adds_no_latency_sample():
+    async def scenario():
+        router = _router()
+
+        async def attempt(name):
+            if name == "full":
+                await asyncio.sleep(10)
+            return name
+
+        assert await asyncio.wait_for(router.call(attempt, "full"), 1) == "fast"
+        stats = router.stats()["models"]
+        assert stats["full"]["losses"] == 1
+        assert stats["full"]["p50_ms"] is None
+        assert stats["full"]["win_rate"] == 0
+        assert stats["fast"]["wins"] == 1
+        assert stats["fast"]["win_rate"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_hedge_defaults_to_the_other_tier_and_never_races_itself():
+    router = _router()
+    router.hedge_model = ""
+    assert router.hedge_target("full") == "fast"
+    assert router.hedge_target("fast") == "full"
+    router.hedge_model = "fast"
+    assert router.hedge_target("full") == "fast"
+    assert router.hedge_target("fast") is None
+
+
+def test_unraced_calls_count_as_completed_not_won():
+    async def scenario():
+        router = _router()
+        router.hedge_enabled = False
+
+        async def attempt(name):
+            return name
+
+        assert await router.call(attempt, "full") == "full"
+        stats = router.stats()["models"]["full"]
+        assert stats["completed"] == 1
+        assert stats["wins"] == 0
+        assert stats["win_rate"] is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,28 @@
+import asyncio
+
+from utils.session_gate import SessionGate
+
+
+async def _drain(events):
+    return [event["event"] async for event in events]
+
+
+def test_batch_hold_does_not_fill_the_interactive_queue():
+    async def scenario():
+        gate = SessionGate(max_depth=1, coalesce=False)
+        async with gate.hold("s1"):
+            # The interactive request queues behind the batch instead of a 429
+            ticket = gate.admit("s1", "hello")
+            assert ticket.leader
+            assert gate.stats()["in_progress"] == 2
+
+            async def events():
+                yield {"event": "end", "data": ""}
+
+            run = asyncio.ensure_future(_drain(ticket.run(events())))
+            await asyncio.sleep(0.01)
+            assert not run.done()
+        assert await asyncio.wait_for(run, 1) == ["end"]
+        assert gate.stats()["sessions"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,88 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from utils.stream import StreamHelper
+
+
+def _decode(frame: bytes) -> str:
+    # Client side of the SSE spec: data lines joined with "\n"
+    lines = frame.decode().split("\n")
+    return "\n".join(line[len("data: "):] for line in lines if line.startswith("data: "))
+
+
+def test_trailing_newlines_survive_encoding():
+    assert _decode(StreamHelper.encode_event("chunk", "Hello\n")) == "Hello\n"
+    assert _decode(StreamHelper.encode_event("chunk", "\n\n")) == "\n\n"
+    assert _decode(StreamHelper.encode_event("chunk", "- a\n- b\n\n")) == "- a\n- b\n\n"
+
+
+def test_carriage_returns_are_normalized():
+    assert _decode(StreamHelper.encode_event("chunk", "one\r\ntwo\rthree\r\n")) == "one\ntwo\nthree\n"
+
+
+def test_single_line_data_is_unchanged():
+    assert StreamHelper.encode_event("chunk", "Hello", "r-1") == b"id: r-1\nevent: chunk\ndata: Hello\n\n"
+
+
+async def _collect(frames):
+    return [frame async for frame in frames]
+
+
+def test_chunks_after_the_first_are_coalesced():
+    async def events():
+        for data in ["Hel", "lo ", "wor", "ld"]:
+            yield {"event": "chunk", "data": data}
+        yield {"event": "end", "data": ""}
+
+    frames = asyncio.run(_collect(StreamHelper.frame_events(events(), flush_interval=1)))
+    assert frames == [
+        b"event: chunk\ndata: Hel\n\n",
+        b"event: chunk\ndata: lo world\n\n",
+        b"event: end\ndata: \n\n"
+    ]
+
+
+def test_upstream_steps_share_one_context():
+    current = contextvars.ContextVar("current", default=None)
+
+    async def events():
+        current.set("set by the first step")
+        yield {"event": "chunk", "data": "a"}
+        yield {"event": "chunk", "data": current.get()}
+
+    frames = asyncio.run(_collect(StreamHelper.frame_events(events(), flush_interval=0)))
+    assert frames[-1] == b"event: chunk\ndata: set by the first step\n\n"
+
+
+def test_upstream_errors_reach_the_reader():
+    async def events():
+        yield {"event": "chunk", "data": "a"}
+        raise ValueError("upstream failed")
+
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(StreamHelper.frame_events(events())))
+
+
+def test_cancellation_reaches_the_pending_upstream_read():
+    async def scenario():
+        upstream_cancelled = asyncio.Event()
+
+        async def events():
+            yield {"event": "chunk", "data": "a"}
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+            yield {"event": "chunk", "data": "b"}
+
+        task = asyncio.ensure_future(_collect(StreamHelper.frame_events(events())))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert upstream_cancelled.is_set()
+
+    asyncio.run(scenario())
@@ -1,37 +1,146 @@
+import os
+import re
 from typing import Dict, List, Any
 from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+from models import AppointmentAvailabilityRequest, AppointmentBookingRequest, EarliestAppointmentsRequest
+from tools.dealership import DealershipTool
+from tools.inventory import AppointmentInventory, parse_business_hours
+from tools.registry import registry
+
+# Load environment variables
+load_dotenv()
+
+# Appointment inventory settings
+APPOINTMENT_DB_PATH = os.getenv("APPOINTMENT_DB_PATH", "appointments.db")
+APPOINTMENT_HOURS = os.getenv("APPOINTMENT_HOURS", "09:00-12:00,13:00-17:00")
+APPOINTMENT_SLOT_MINUTES = int(os.getenv("APPOINTMENT_SLOT_MINUTES", "60"))
+APPOINTMENT_CLOSED_WEEKDAYS = {
+    int(day) for day in os.getenv("APPOINTMENT_CLOSED_WEEKDAYS", "").split(",") if day.strip()
+}
+
+# Date range of the earliest-slot search
+APPOINTMENT_SEARCH_DEFAULT_DAYS = int(os.getenv("APPOINTMENT_SEARCH_DEFAULT_DAYS", "14"))
+APPOINTMENT_SEARCH_MAX_DAYS = int(os.getenv("APPOINTMENT_SEARCH_MAX_DAYS", "31"))
+
+# Speculative prefetch: availability questions naming a dealership ID and an
+# explicit date; relative dates are left to the model
+_AVAILABILITY_INTENT = re.compile(r"\b(?:availab\w*|slots?|open|free|appointments?|test.?drive|book)\b", re.IGNORECASE)
+_ISO_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
 
 class AppointmentTool:
+    inventory = AppointmentInventory(
+        db_path=APPOINTMENT_DB_PATH,
+        slot_times=parse_business_hours(APPOINTMENT_HOURS, APPOINTMENT_SLOT_MINUTES),
+        closed_weekdays=APPOINTMENT_CLOSED_WEEKDAYS
+    )
+
+    @staticmethod
+    def startup() -> None:
+        """
+        Open the booking store and load upcoming bookings
+        """
+        AppointmentTool.inventory.open()
+
+    @staticmethod
+    def shutdown() -> None:
+        AppointmentTool.inventory.close()
+
     @staticmethod
     async def check_appointment_availability(dealership_id: str, date: str) -> Dict[str, Any]:
         """
         Check available appointment slots for a specific dealership and date
         
-        Mock implementation with predefined availability
+        Availability comes from the in-memory slot bitmaps of the inventory
         """
         # Validate date format
         try:
-            parsed_date = datetime.strptime(date, "%Y-%m-%d")
+            datetime.strptime(date, "%Y-%m-%d")
         except ValueError:
             return {"error": "Invalid date format. Use YYYY-MM-DD"}
         
-        # Mock availability (simulating business hours from 9am to 5pm)
-        time_slots = [
-            {"time": "09:00", "available": True},
-            {"time": "10:00", "available": True},
-            {"time": "11:00", "available": True},
-            {"time": "13:00", "available": True},
-            {"time": "14:00", "available": True},
-            {"time": "15:00", "available": True},
-            {"time": "16:00", "available": True}
-        ]
-        
+        AppointmentTool.inventory.open()
         return {
             "dealership_id": dealership_id,
             "date": date,
-            "slots": time_slots
+            "slots": await AppointmentTool.inventory.slots(dealership_id, date)
         }
     
+    @staticmethod
+    async def find_earliest_slots(
+        car_model: str,
+        dealership_ids: List[str],
+        region: str,
+        start_date: str,
+        end_date: str,
+        limit: int
+    ) -> Dict[str, Any]:
+        """
+        Find the earliest open test drive slots across dealerships and dates
+
+        One call replaces a check_appointment_availability round-trip per
+        dealership and day. Slots that have already started are skipped.
+
+        :param car_model: Car model for the test drive, passed through for booking
+        :param dealership_ids: Dealerships to search; when empty, region is used
+        :param region: City or state code
+        :param start_date: First date (YYYY-MM-DD); empty for today
+        :param end_date: Last date (YYYY-MM-DD); empty for the default range
+        :param limit: Number of slots to return
+        """
+        now = datetime.now()
+        try:
+            start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else now
+            end = (
+                datetime.strptime(end_date, "%Y-%m-%d") if end_date
+                else start + timedelta(days=APPOINTMENT_SEARCH_DEFAULT_DAYS - 1)
+            )
+        except ValueError:
+            return {"error": "Invalid date format. Use YYYY-MM-DD"}
+
+        start = max(start.date(), now.date())
+        end = min(end.date(), start + timedelta(days=APPOINTMENT_SEARCH_MAX_DAYS - 1))
+        if end < start:
+            return {"error": "The date range is in the past or ends before it starts"}
+
+        directory = DealershipTool.directory()
+        if dealership_ids:
+            dealerships = []
+            for dealership_id in dealership_ids:
+                dealership = directory.get(dealership_id)
+                if dealership is None:
+                    return {"error": f"Dealership {dealership_id} not found"}
+                if dealership not in dealerships:
+                    dealerships.append(dealership)
+        elif region:
+            dealerships = directory.in_region(region)
+            if not dealerships:
+                return {"error": f"No dealerships found in {region}"}
+        else:
+            return {"error": "Give the dealership IDs or a region to search"}
+
+        dates = [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+        AppointmentTool.inventory.open()
+        found = await AppointmentTool.inventory.earliest_slots(
+            [dealership["id"] for dealership in dealerships],
+            dates,
+            limit,
+            not_before=now.strftime("%Y-%m-%d %H:%M")
+        )
+
+        names = {dealership["id"]: dealership.get("name", dealership["id"]) for dealership in dealerships}
+        return {
+            "car_model": car_model,
+            "start_date": dates[0],
+            "end_date": dates[-1],
+            "dealership_ids": list(names),
+            "slots": [
+                {"dealership_id": dealership_id, "dealership_name": names[dealership_id], "date": date, "time": time}
+                for date, time, dealership_id in found
+            ]
+        }
+
     @staticmethod
     async def schedule_appointment(
         user_id: str, 
@@ -43,22 +152,108 @@ class AppointmentTool:
         """
         Schedule a test drive appointment
         
-        Mock implementation to simulate booking
+        The slot is checked and booked atomically, so two customers cannot
+        take the same slot
         """
         # Validate inputs
         try:
-            datetime.strptime(date, "%Y-%m-%d")
-            datetime.strptime(time, "%H:%M")
+            slot_start = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
         except ValueError:
             return {"error": "Invalid date or time format"}
         
-        # Generate a mock booking confirmation
-        return {
+        if slot_start < datetime.now():
+            return {"error": "Appointments can't be scheduled in the past"}
+        
+        booking = {
             "booking_id": f"appt_{user_id}_{dealership_id}_{date.replace('-', '')}_{time.replace(':', '')}",
             "user_id": user_id,
             "dealership_id": dealership_id,
             "date": date,
             "time": time,
-            "car_model": car_model,
-            "status": "confirmed"
-        }
\ No newline at end of file
+            "car_model": car_model
+        }
+        
+        AppointmentTool.inventory.open()
+        error = await AppointmentTool.inventory.book(booking)
+        if error:
+            return {"error": error}
+        
+        return {**booking, "status": "confirmed"}
+
+
+def _format_availability(args: AppointmentAvailabilityRequest, result: Dict[str, Any]) -> str:
+    if "error" in result:
+        return result["error"]
+    available_slots = sum(1 for slot in result["slots"] if slot["available"])
+    return f"We have {available_slots} available slots on {result['date']} at our {result['dealership_id']} location."
+
+
+def _format_earliest_slots(args: EarliestAppointmentsRequest, result: Dict[str, Any]) -> Any:
+    if "error" in result:
+        return result["error"]
+    if not result["slots"]:
+        return f"There are no open slots between {result['start_date']} and {result['end_date']}."
+    # availableTimes is what the frontend's availability card renders
+    return {
+        "availableTimes": [
+            f"{datetime.strptime(slot['date'], '%Y-%m-%d'):%a %b %d} {slot['time']} · {slot['dealership_name']}"
+            for slot in result["slots"]
+        ],
+        **result
+    }
+
+
+def _format_booking(args: AppointmentBookingRequest, result: Dict[str, Any]) -> str:
+    if "error" in result:
+        return result["error"]
+    return f"Appointment scheduled for {result['car_model']} on {result['date']} at {result['time']}. Your booking ID is {result['booking_id']}."
+
+
+def _speculate_availability(text: str) -> List[Dict[str, Any]]:
+    if not _AVAILABILITY_INTENT.search(text):
+        return []
+    dates = _ISO_DATE.findall(text)
+    if not dates:
+        return []
+    return [
+        {"dealership_id": dealership_id, "date": date}
+        for dealership_id in DealershipTool.directory().mentioned_ids(text)
+        for date in dates
+    ]
+
+
+registry.register(
+    "check_appointment_availability",
+    "Check available appointment slots for a dealership on a specific date",
+    AppointmentAvailabilityRequest,
+    handler=lambda args: AppointmentTool.check_appointment_availability(args.dealership_id, args.date),
+    formatter=_format_availability,
+    # Availability changes with every booking
+    cacheable=False,
+    speculate=_speculate_availability
+)
+
+registry.register(
+    "find_earliest_appointments",
+    "Find the earliest open test drive slots across several dealerships or a region over a date range, "
+    "instead of checking one dealership and date at a time",
+    EarliestAppointmentsRequest,
+    handler=lambda args: AppointmentTool.find_earliest_slots(
+        args.car_model, args.dealership_ids, args.region, args.start_date, args.end_date, args.limit
+    ),
+    formatter=_format_earliest_slots,
+    # Availability changes with every booking
+    cacheable=False
+)
+
+registry.register(
+    "schedule_appointment",
+    "Schedule a test drive appointment",
+    AppointmentBookingRequest,
+    handler=lambda args: AppointmentTool.schedule_appointment(
+        args.user_id, args.dealership_id, args.date, args.time, args.car_model
+    ),
+    formatter=_format_booking,
+    # Booking has side effects and must never be replayed
+    cacheable=False
+)
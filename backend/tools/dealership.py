@@ -1,51 +1,184 @@
-from typing import Dict, Any
+import os
+import logging
+import re
+import httpx
+from typing import Dict, Any, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from models import DealershipAddressRequest, DealershipSearchRequest, NearestDealershipRequest
+from tools.directory import DealershipDirectory
+from tools.registry import registry
+from utils.cache import AsyncTTLCache
+from utils.http_client import ToolHTTPClient
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Dealership data file, loaded once on first use
+DEALERSHIP_DATA_PATH = os.getenv(
+    "DEALERSHIP_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "dealerships.json")
+)
+
+# Geocoding for "nearest dealership" queries about places without a dealership
+OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
+OPENWEATHERMAP_GEOCODING_URL = os.getenv(
+    "OPENWEATHERMAP_GEOCODING_URL",
+    "https://api.openweathermap.org/geo/1.0/direct"
+)
+
+# Minimum similarity for treating an unknown ID as a dealership name
+FUZZY_ID_MIN_SCORE = 0.85
+
+# Speculative prefetch: questions about where a dealership is
+_ADDRESS_INTENT = re.compile(r"\b(?:address|where|located|location|directions|get to|find)\b", re.IGNORECASE)
 
 class DealershipTool:
+    _directory: Optional[DealershipDirectory] = None
+    _geocode_cache = AsyncTTLCache(max_size=1024, ttl=24 * 3600)
+
+    @staticmethod
+    def directory() -> DealershipDirectory:
+        """
+        Return the dealership directory, loading the data file on first use
+        """
+        if DealershipTool._directory is None:
+            DealershipTool._directory = DealershipDirectory.from_file(DEALERSHIP_DATA_PATH)
+        return DealershipTool._directory
+
     @staticmethod
     async def get_dealership_address(dealership_id: str) -> Dict[str, Any]:
         """
-        Fetch dealership address using a mock implementation
-        
-        In a real-world scenario, this would query a database or external service
-        """
-        mock_dealerships = {
-            "supercar_nyc": {
-                "id": "supercar_nyc",
-                "name": "SuperCar New York Dealership",
-                "address": "123 Broadway, New York, NY 10001",
-                "phone": "(212) 555-1234",
-                "hours": "Monday-Friday: 9AM-7PM, Saturday: 10AM-5PM, Sunday: Closed"
-            },
-            "supercar_la": {
-                "id": "supercar_la", 
-                "name": "SuperCar Los Angeles Dealership",
-                "address": "456 Sunset Blvd, Los Angeles, CA 90028",
-                "phone": "(323) 555-5678",
-                "hours": "Monday-Friday: 9AM-8PM, Saturday-Sunday: 10AM-6PM"
-            },
-            "LEX001": {
-                "id": "LEX001",
-                "name": "Lex Luxury Auto",
-                "address": "789 Luxury Lane, Beverly Hills, CA 90210",
-                "phone": "(310) 555-9876",
-                "hours": "Monday-Saturday: 8AM-8PM, Sunday: 10AM-4PM"
-            },
-            "D123": {
-                "id": "D123",
-                "name": "Premium Motors",
-                "address": "321 Elite Drive, Miami, FL 33139",
-                "phone": "(305) 555-4321",
-                "hours": "Monday-Friday: 9AM-7PM, Saturday: 9AM-5PM, Sunday: Closed"
-            }
-        }
-        
-        # Default dealership for unknown IDs
-        default_dealership = {
-            "id": dealership_id,
-            "name": "SuperCar Dealership",
-            "address": "123 Luxury Lane, Premium City",
-            "phone": "(800) 555-0000",
-            "hours": "Monday-Friday: 9AM-7PM, Saturday: 10AM-5PM, Sunday: Closed"
+        Fetch a dealership by ID from the directory
+
+        Unknown IDs fall back to a close match on the dealership name
+        """
+        directory = DealershipTool.directory()
+        dealership = directory.get(dealership_id)
+        if dealership is None:
+            matches = directory.search(dealership_id, limit=2, min_score=FUZZY_ID_MIN_SCORE)
+            # Only accept an unambiguous match
+            if not matches or (len(matches) > 1 and matches[1][1] >= matches[0][1]):
+                return {"error": f"Dealership {dealership_id} not found"}
+            dealership = matches[0][0]
+        return dealership
+
+    @staticmethod
+    async def find_dealerships(query: str, limit: int = 3) -> Dict[str, Any]:
+        """
+        Fuzzy-search dealerships by name or city
+        """
+        matches = DealershipTool.directory().search(query, limit=limit)
+        if not matches:
+            return {"error": f"No dealership matches '{query}'"}
+        return {"query": query, "dealerships": [dealership for dealership, _ in matches]}
+
+    @staticmethod
+    async def find_nearest_dealership(location: str, limit: int = 1) -> Dict[str, Any]:
+        """
+        Find the dealerships closest to a city or place name
+        """
+        directory = DealershipTool.directory()
+        coordinates = directory.city_location(location) or await DealershipTool._geocode(location)
+        if coordinates is None:
+            return {"error": f"Couldn't find a location named '{location}'"}
+
+        nearest = directory.nearest(*coordinates, k=limit)
+        if not nearest:
+            return {"error": "No dealership locations are available"}
+        return {
+            "location": location,
+            "dealerships": [
+                {**dealership, "distance_miles": round(distance, 1)}
+                for dealership, distance in nearest
+            ]
         }
-        
-        return mock_dealerships.get(dealership_id, default_dealership)
\ No newline at end of file
+
+    @staticmethod
+    async def _geocode(location: str) -> Optional[Tuple[float, float]]:
+        if not OPENWEATHERMAP_API_KEY:
+            return None
+
+        async def _lookup() -> Optional[Tuple[float, float]]:
+            try:
+                response = await ToolHTTPClient.get().get(
+                    OPENWEATHERMAP_GEOCODING_URL,
+                    params={"q": location, "limit": 1, "appid": OPENWEATHERMAP_API_KEY}
+                )
+                response.raise_for_status()
+                places: List[Dict[str, Any]] = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning("Geocoding failed for %s: %s", location, e)
+                return None
+            if not places:
+                return None
+            return places[0]["lat"], places[0]["lon"]
+
+        return await DealershipTool._geocode_cache.get_or_load(
+            " ".join(location.split()).casefold(),
+            _lookup,
+            cacheable=lambda coordinates: coordinates is not None
+        )
+
+
+def _format_dealership_address(args: DealershipAddressRequest, result: Dict[str, Any]) -> str:
+    if "error" in result:
+        return f"Sorry, we couldn't find information for dealership {args.dealership_id}."
+    return f"Our dealership is located at {result['address']}. You can contact us at {result['phone']}."
+
+
+def _format_dealership_search(args: DealershipSearchRequest, result: Dict[str, Any]) -> str:
+    if "error" in result:
+        return f"Sorry, we couldn't find a dealership matching {args.query}."
+    return " ".join(
+        f"{dealership['name']} ({dealership['id']}) is located at {dealership['address']}. You can contact us at {dealership['phone']}."
+        for dealership in result["dealerships"]
+    )
+
+
+def _format_nearest_dealership(args: NearestDealershipRequest, result: Dict[str, Any]) -> str:
+    if "error" in result:
+        return f"Sorry, we couldn't find a dealership near {args.location}."
+    dealership = result["dealerships"][0]
+    if dealership["distance_miles"] < 1:
+        intro = f"Our dealership in {args.location} is {dealership['name']} ({dealership['id']})."
+    else:
+        intro = (
+            f"Our closest dealership to {args.location} is {dealership['name']} ({dealership['id']}), "
+            f"about {dealership['distance_miles']} miles away."
+        )
+    return f"{intro} It is located at {dealership['address']}. You can contact us at {dealership['phone']}."
+
+
+def _speculate_address(text: str) -> List[Dict[str, Any]]:
+    if not _ADDRESS_INTENT.search(text):
+        return []
+    return [{"dealership_id": dealership_id} for dealership_id in DealershipTool.directory().mentioned_ids(text)]
+
+
+registry.register(
+    "get_dealership_address",
+    "Retrieve address for a specific dealership",
+    DealershipAddressRequest,
+    handler=lambda args: DealershipTool.get_dealership_address(args.dealership_id),
+    formatter=_format_dealership_address,
+    speculate=_speculate_address
+)
+
+registry.register(
+    "find_dealership",
+    "Search dealerships by name or city when the dealership ID is not known",
+    DealershipSearchRequest,
+    handler=lambda args: DealershipTool.find_dealerships(args.query),
+    formatter=_format_dealership_search
+)
+
+registry.register(
+    "find_nearest_dealership",
+    "Find the dealership closest to a city or place",
+    NearestDealershipRequest,
+    handler=lambda args: DealershipTool.find_nearest_dealership(args.location),
+    formatter=_format_nearest_dealership
+)
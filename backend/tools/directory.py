@@ -0,0 +1,227 @@
+import difflib
+import heapq
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+EARTH_RADIUS_MILES = 3958.8
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_ID_TOKEN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase and collapse punctuation/whitespace for index keys
+    """
+    return " ".join(_NON_WORD.split(text.casefold())).strip()
+
+
+def _to_unit_vector(latitude: float, longitude: float) -> Tuple[float, float, float]:
+    # Chord length on the unit sphere grows monotonically with great-circle distance,
+    # so a Euclidean k-d tree over these points gives exact nearest neighbours
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord_to_miles(squared_chord: float) -> float:
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(squared_chord) / 2))
+
+
+class KDTree:
+    def __init__(self, points: List[Tuple[float, ...]]):
+        """
+        Static k-d tree for nearest-neighbour queries
+
+        :param points: Points of equal dimension; results refer to their indices
+        """
+        self._points = points
+        self._dimensions = len(points[0]) if points else 0
+        self._root = self._build(list(range(len(points))), 0)
+
+    def _build(self, indices: List[int], depth: int) -> Optional[tuple]:
+        if not indices:
+            return None
+        axis = depth % self._dimensions
+        indices.sort(key=lambda index: self._points[index][axis])
+        middle = len(indices) // 2
+        return (
+            indices[middle],
+            axis,
+            self._build(indices[:middle], depth + 1),
+            self._build(indices[middle + 1:], depth + 1)
+        )
+
+    def nearest(self, target: Tuple[float, ...], k: int = 1) -> List[Tuple[float, int]]:
+        """
+        Return up to k (squared distance, index) pairs, closest first
+        """
+        best: List[Tuple[float, int]] = []  # max-heap via negated distances
+
+        def visit(node: Optional[tuple]) -> None:
+            if node is None:
+                return
+            index, axis, left, right = node
+            point = self._points[index]
+            distance = sum((a - b) ** 2 for a, b in zip(point, target))
+            if len(best) < k:
+                heapq.heappush(best, (-distance, index))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, index))
+
+            offset = target[axis] - point[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            visit(near)
+            if len(best) < k or offset * offset < -best[0][0]:
+                visit(far)
+
+        visit(self._root)
+        return sorted((-negated, index) for negated, index in best)
+
+
+class DealershipDirectory:
+    def __init__(self, dealerships: List[Dict[str, Any]]):
+        """
+        In-memory dealership directory with ID, name/city and spatial indexes
+
+        :param dealerships: Records with id, name, address, city, phone, hours,
+                            latitude and longitude
+        """
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_folded_id: Dict[str, Dict[str, Any]] = {}
+        self._by_city: Dict[str, List[Dict[str, Any]]] = {}
+        self._token_index: Dict[str, Set[str]] = {}
+        self._search_keys: Dict[str, Tuple[str, str]] = {}
+
+        located = []
+        for dealership in dealerships:
+            dealership_id = dealership["id"]
+            self._by_id[dealership_id] = dealership
+            self._by_folded_id[dealership_id.casefold()] = dealership
+
+            name_key = normalize(dealership.get("name", ""))
+            city_key = normalize(dealership.get("city", ""))
+            self._search_keys[dealership_id] = (name_key, city_key)
+            if city_key:
+                self._by_city.setdefault(city_key, []).append(dealership)
+            for token in set(f"{name_key} {city_key}".split()):
+                self._token_index.setdefault(token, set()).add(dealership_id)
+
+            if dealership.get("latitude") is not None and dealership.get("longitude") is not None:
+                located.append(dealership)
+
+        self._vocabulary = list(self._token_index)
+        self._located = located
+        self._tree = KDTree([
+            _to_unit_vector(dealership["latitude"], dealership["longitude"])
+            for dealership in located
+        ])
+
+    @classmethod
+    def from_file(cls, path: str) -> "DealershipDirectory":
+        """
+        Load the directory from a JSON list of dealership records
+        """
+        with open(path, encoding="utf-8") as data_file:
+            return cls(json.load(data_file))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, dealership_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a dealership by ID, ignoring case
+        """
+        return self._by_id.get(dealership_id) or self._by_folded_id.get(dealership_id.strip().casefold())
+
+    def mentioned_ids(self, text: str) -> List[str]:
+        """
+        Return the IDs of the dealerships referred to by ID in free text, in order
+        """
+        found: List[str] = []
+        for token in _ID_TOKEN.findall(text):
+            dealership = self._by_folded_id.get(token.casefold())
+            if dealership is not None and dealership["id"] not in found:
+                found.append(dealership["id"])
+        return found
+
+    def in_region(self, region: str) -> List[Dict[str, Any]]:
+        """
+        Return the dealerships in a city or state (by its code)
+        """
+        key = normalize(region)
+        if not key:
+            return []
+        if key in self._by_city:
+            return list(self._by_city[key])
+        return [
+            dealership for dealership in self._by_id.values()
+            if normalize(dealership.get("state", "")) == key
+        ]
+
+    def city_location(self, city: str) -> Optional[Tuple[float, float]]:
+        """
+        Return the mean coordinates of the dealerships in a city, if any
+        """
+        located = [
+            dealership for dealership in self._by_city.get(normalize(city), [])
+            if dealership.get("latitude") is not None
+        ]
+        if not located:
+            return None
+        return (
+            sum(dealership["latitude"] for dealership in located) / len(located),
+            sum(dealership["longitude"] for dealership in located) / len(located)
+        )
+
+    def search(self, query: str, limit: int = 3, min_score: float = 0.5) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Fuzzy-match dealerships by name or city
+
+        :param query: Free-text name or city
+        :param limit: Maximum number of results
+        :param min_score: Minimum similarity (0-1) for a result
+        :return: (dealership, score) pairs, best first
+        """
+        query_key = normalize(query)
+        if not query_key:
+            return []
+
+        candidates: Set[str] = set()
+        for token in query_key.split():
+            if token in self._token_index:
+                candidates |= self._token_index[token]
+            else:
+                # Only misspelled tokens pay for a scan of the vocabulary
+                for close in difflib.get_close_matches(token, self._vocabulary, n=3, cutoff=0.75):
+                    candidates |= self._token_index[close]
+
+        query_tokens = set(query_key.split())
+        scored = []
+        for dealership_id in candidates:
+            name_key, city_key = self._search_keys[dealership_id]
+            coverage = len(query_tokens & set(f"{name_key} {city_key}".split())) / len(query_tokens)
+            score = max(
+                difflib.SequenceMatcher(None, query_key, name_key).ratio(),
+                difflib.SequenceMatcher(None, query_key, city_key).ratio() if city_key else 0.0,
+                coverage
+            )
+            if score >= min_score:
+                scored.append((self._by_id[dealership_id], score))
+
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Return the k dealerships closest to a point
+
+        :return: (dealership, distance in miles) pairs, closest first
+        """
+        if not self._located:
+            return []
+        return [
+            (self._located[index], _chord_to_miles(squared_chord))
+            for squared_chord, index in self._tree.nearest(_to_unit_vector(latitude, longitude), k)
+        ]
@@ -0,0 +1,313 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+def parse_business_hours(spec: str, slot_minutes: int) -> List[str]:
+    """
+    Expand business hours into slot start times
+
+    :param spec: Comma-separated HH:MM-HH:MM ranges, e.g. "09:00-12:00,13:00-17:00"
+    :param slot_minutes: Length of one appointment slot
+    :return: Sorted list of HH:MM slot start times
+    """
+    slots = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, end = (datetime.strptime(value.strip(), "%H:%M") for value in part.split("-"))
+        start_minutes = start.hour * 60 + start.minute
+        end_minutes = end.hour * 60 + end.minute
+        for minutes in range(start_minutes, end_minutes - slot_minutes + 1, slot_minutes):
+            slots.add(f"{minutes // 60:02d}:{minutes % 60:02d}")
+    return sorted(slots)
+
+
+@lru_cache(maxsize=4096)
+def _weekday(date: str) -> int:
+    return datetime.strptime(date, "%Y-%m-%d").weekday()
+
+
+class AppointmentInventory:
+    def __init__(self, db_path: str, slot_times: List[str], closed_weekdays: Set[int]):
+        """
+        Per-dealership, per-day slot bitmaps backed by SQLite
+
+        Bit i of a day's bitmap is set when slot_times[i] is booked, so
+        availability checks are a couple of integer operations. Bookings
+        reserve the bit under a lock before they are written, and a UNIQUE
+        constraint in SQLite catches conflicts from other processes.
+        Bookings committed by other processes are applied by refresh()
+        before every query and booking.
+
+        Database calls run on one dedicated thread, never on the event loop,
+        and the lock only guards the bitmaps, so waiting for another process's
+        write lock does not stall the loop.
+
+        :param db_path: SQLite database file (":memory:" for tests and scripts)
+        :param slot_times: Bookable slot start times, in order
+        :param closed_weekdays: Weekdays (Monday=0) with no slots
+        """
+        self.db_path = db_path
+        self.slot_times = slot_times
+        self.closed_weekdays = closed_weekdays
+        self._slot_index = {slot_time: index for index, slot_time in enumerate(slot_times)}
+        self._full_mask = (1 << len(slot_times)) - 1
+        self._booked: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Last bookings row read and the database version it was read at;
+        # only touched on the database thread once the inventory is open
+        self._max_rowid = 0
+        self._data_version: Optional[int] = None
+
+    def open(self) -> None:
+        """
+        Open the database and load upcoming bookings into memory
+        """
+        with self._lock:
+            if self._db is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="appointment-db")
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bookings (
+                    booking_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    dealership_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    time TEXT NOT NULL,
+                    car_model TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    UNIQUE (dealership_id, date, time)
+                )
+                """
+            )
+        self.load()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+                self._db.close()
+                self._db = None
+
+    def load(self) -> int:
+        """
+        Rebuild the bitmaps from every booking from today onwards
+
+        :return: Number of bookings loaded
+        """
+        rows = self._executor.submit(self._read_all).result()
+        with self._lock:
+            self._booked.clear()
+            for dealership_id, date, slot_time in rows:
+                self._mark_booked(dealership_id, date, slot_time)
+        return len(rows)
+
+    async def refresh(self) -> int:
+        """
+        Apply bookings committed by other processes since the last check
+
+        PRAGMA data_version only changes when another connection commits, so
+        this is a single cheap query while this process is the only writer.
+        Bookings are never deleted, so new ones are exactly the rows after
+        the last rowid seen.
+
+        :return: Number of new booking rows read
+        """
+        if self._executor is None:
+            return 0
+        rows = await self._run(self._read_new)
+        if rows:
+            with self._lock:
+                for dealership_id, date, slot_time in rows:
+                    self._mark_booked(dealership_id, date, slot_time)
+        return len(rows)
+
+    def _read_all(self) -> List[Tuple[str, str, str]]:
+        today = datetime.now().strftime("%Y-%m-%d")
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        self._max_rowid = self._db.execute("SELECT COALESCE(MAX(rowid), 0) FROM bookings").fetchone()[0]
+        return self._db.execute(
+            "SELECT dealership_id, date, time FROM bookings WHERE date >= ? AND rowid <= ?",
+            (today, self._max_rowid)
+        ).fetchall()
+
+    def _read_new(self) -> List[Tuple[str, str, str]]:
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return []
+        self._data_version = version
+        today = datetime.now().strftime("%Y-%m-%d")
+        rows = self._db.execute(
+            "SELECT rowid, dealership_id, date, time FROM bookings WHERE rowid > ? ORDER BY rowid",
+            (self._max_rowid,)
+        ).fetchall()
+        if rows:
+            self._max_rowid = rows[-1][0]
+        return [(dealership_id, date, slot_time) for _, dealership_id, date, slot_time in rows if date >= today]
+
+    def _mark_booked(self, dealership_id: str, date: str, slot_time: str) -> None:
+        index = self._slot_index.get(slot_time)
+        if index is not None:
+            key = (dealership_id, date)
+            self._booked[key] = self._booked.get(key, 0) | (1 << index)
+
+    def available_mask(self, dealership_id: str, date: str) -> int:
+        """
+        Return the bitmap of open slots for a dealership on a date
+        """
+        if _weekday(date) in self.closed_weekdays:
+            return 0
+        return self._full_mask & ~self._booked.get((dealership_id, date), 0)
+
+    async def slots(self, dealership_id: str, date: str) -> List[Dict[str, Any]]:
+        """
+        Return every slot of the day with its availability
+        """
+        await self.refresh()
+        mask = self.available_mask(dealership_id, date)
+        return [
+            {"time": slot_time, "available": bool(mask >> index & 1)}
+            for index, slot_time in enumerate(self.slot_times)
+        ]
+
+    async def earliest_slots(
+        self,
+        dealership_ids: List[str],
+        dates: List[str],
+        limit: int,
+        not_before: Optional[str] = None
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Find the earliest open slots across several dealerships and days
+
+        Days are scanned in order straight from the bitmaps, and the scan stops
+        at the first day that completes the result.
+
+        :param dealership_ids: Dealerships to search; ties go to the earlier one
+        :param dates: YYYY-MM-DD dates in ascending order
+        :param limit: Maximum number of slots returned
+        :param not_before: "YYYY-MM-DD HH:MM"; earlier and equal slots are skipped
+        :return: (date, time, dealership_id) tuples, earliest first
+        """
+        await self.refresh()
+        found: List[Tuple[str, str, str]] = []
+        for date in dates:
+            if _weekday(date) in self.closed_weekdays:
+                continue
+            # Slots of the day that have already started
+            past = 0
+            if not_before is not None and date <= not_before[:10]:
+                past = self._full_mask
+                if date == not_before[:10]:
+                    past = sum(
+                        1 << index for index, slot_time in enumerate(self.slot_times)
+                        if slot_time <= not_before[11:]
+                    )
+            day = []
+            for order, dealership_id in enumerate(dealership_ids):
+                mask = self.available_mask(dealership_id, date) & ~past
+                while mask:
+                    lowest = mask & -mask
+                    day.append((lowest.bit_length() - 1, order, dealership_id))
+                    mask ^= lowest
+            day.sort()
+            for index, _, dealership_id in day[:limit - len(found)]:
+                found.append((date, self.slot_times[index], dealership_id))
+            if len(found) >= limit:
+                break
+        return found
+
+    def is_available(self, dealership_id: str, date: str, time: str) -> bool:
+        index = self._slot_index.get(time)
+        return index is not None and bool(self.available_mask(dealership_id, date) >> index & 1)
+
+    async def book(self, booking: Dict[str, str]) -> Optional[str]:
+        """
+        Atomically check and book a slot
+
+        :param booking: booking_id, user_id, dealership_id, date, time and car_model
+        :return: None on success, otherwise an error message
+        """
+        key = (booking["dealership_id"], booking["date"])
+        index = self._slot_index.get(booking["time"])
+        if index is None:
+            return f"{booking['time']} is not a bookable slot. Available times are {', '.join(self.slot_times)}."
+
+        await self.refresh()
+        # Reserve the bit first so concurrent requests for the same slot fail fast
+        with self._lock:
+            if not self.available_mask(*key) >> index & 1:
+                return f"The {booking['time']} slot on {booking['date']} is no longer available."
+            self._booked[key] = self._booked.get(key, 0) | (1 << index)
+
+        try:
+            await self._run(self._insert, [booking])
+        except sqlite3.IntegrityError:
+            # Booked by another process; keep the bit set since the slot is taken
+            return f"The {booking['time']} slot on {booking['date']} is no longer available."
+        except Exception:
+            with self._lock:
+                self._booked[key] &= ~(1 << index)
+            raise
+        return None
+
+    def bulk_load(self, bookings: Iterable[Dict[str, str]]) -> Tuple[int, int]:
+        """
+        Insert many bookings in one transaction, skipping conflicting slots
+
+        :param bookings: Booking dictionaries as accepted by book()
+        :return: (booked, rejected) counts
+        """
+        accepted = []
+        rejected = 0
+        with self._lock:
+            for booking in bookings:
+                key = (booking["dealership_id"], booking["date"])
+                index = self._slot_index.get(booking["time"])
+                if index is None or not self.available_mask(*key) >> index & 1:
+                    rejected += 1
+                    continue
+                self._booked[key] = self._booked.get(key, 0) | (1 << index)
+                accepted.append(booking)
+
+        # Slots taken by another process are skipped; their bits stay set since they are booked
+        self._executor.submit(self._insert, accepted, True).result()
+        return len(accepted), rejected
+
+    async def _run(self, method: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+    def _insert(self, bookings: List[Dict[str, str]], ignore_conflicts: bool = False) -> None:
+        created_at = datetime.now().isoformat(timespec="seconds")
+        verb = "INSERT OR IGNORE" if ignore_conflicts else "INSERT"
+        # Runs on the database thread, which serializes use of the connection
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany(
+                f"{verb} INTO bookings (booking_id, user_id, dealership_id, date, time, car_model, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        booking["booking_id"], booking["user_id"], booking["dealership_id"],
+                        booking["date"], booking["time"], booking["car_model"], created_at
+                    )
+                    for booking in bookings
+                ]
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
@@ -0,0 +1,198 @@
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+
+
+class ToolResult(NamedTuple):
+    # Formatted output sent to the client
+    output: Any
+    # Set for error and fallback outputs, which must never be cached
+    is_error: bool = False
+
+
+class ToolSpec:
+    __slots__ = ("name", "description", "args_model", "handler", "formatter", "cacheable", "speculate")
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        args_model: Type[BaseModel],
+        handler: Callable[[BaseModel], Awaitable[Any]],
+        formatter: Callable[[BaseModel, Any], Any],
+        cacheable: bool = True,
+        speculate: Optional[Callable[[str], List[Dict[str, Any]]]] = None
+    ):
+        self.name = name
+        self.description = description
+        self.args_model = args_model
+        self.handler = handler
+        self.formatter = formatter
+        self.cacheable = cacheable
+        self.speculate = speculate
+
+    def schema(self) -> Dict[str, Any]:
+        """
+        Build the function-calling schema from the argument model
+        """
+        model_schema = self.args_model.model_json_schema()
+        properties = {
+            field: {key: value for key, value in spec.items() if key != "title"}
+            for field, spec in model_schema.get("properties", {}).items()
+        }
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": model_schema.get("required", [])
+                }
+            }
+        }
+
+
+class ToolRegistry:
+    def __init__(self):
+        """
+        Name-indexed registry of the tools exposed to the model
+        """
+        self._tools: Dict[str, ToolSpec] = {}
+        self._schemas: Optional[List[Dict[str, Any]]] = None
+        self._schema_json: Optional[str] = None
+        self._schema_version: Optional[str] = None
+
+    def register(
+        self,
+        name: str,
+        description: str,
+        args_model: Type[BaseModel],
+        handler: Callable[[BaseModel], Awaitable[Any]],
+        formatter: Callable[[BaseModel, Any], Any],
+        cacheable: bool = True,
+        speculate: Optional[Callable[[str], List[Dict[str, Any]]]] = None
+    ) -> None:
+        """
+        Register a tool once at import time
+
+        :param name: Function name the model calls
+        :param description: Description shown to the model
+        :param args_model: Pydantic model validating the call arguments
+        :param handler: Coroutine receiving the validated arguments
+        :param formatter: Turns (arguments, handler result) into the tool output
+        :param cacheable: Whether a model turn using this tool may be replayed
+                          from the response cache instead of running the tool
+        :param speculate: Extracts the arguments of likely calls from a user
+                          message so they can run before the model asks; only
+                          for tools without side effects
+        """
+        if name in self._tools:
+            raise ValueError(f"Tool {name} is already registered")
+        self._tools[name] = ToolSpec(name, description, args_model, handler, formatter, cacheable, speculate)
+        self._schemas = self._schema_json = self._schema_version = None
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self._tools.get(name)
+
+    def is_cacheable(self, name: str) -> bool:
+        spec = self._tools.get(name)
+        return spec is not None and spec.cacheable
+
+    def is_speculative(self, name: str) -> bool:
+        spec = self._tools.get(name)
+        return spec is not None and spec.speculate is not None
+
+    def speculative_calls(self, text: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Predict the side-effect-free tool calls a user message is likely to need
+
+        :param text: The user's message
+        :return: (tool name, arguments) pairs, at most one per distinct call
+        """
+        calls: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        for spec in self._tools.values():
+            if spec.speculate is None:
+                continue
+            for arguments in spec.speculate(text):
+                key = self.call_key(spec.name, arguments)
+                if key is not None and key not in calls:
+                    calls[key] = (spec.name, arguments)
+        return list(calls.values())
+
+    def call_key(self, name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """
+        Identify a tool call by its validated arguments, ignoring case and
+        spacing, which none of the speculative tools depend on
+
+        :return: Key string, or None if the arguments are invalid
+        """
+        spec = self._tools.get(name)
+        if spec is None:
+            return None
+        try:
+            args = spec.args_model.model_validate(arguments)
+        except ValidationError:
+            return None
+        normalized = {
+            field: " ".join(value.split()).casefold() if isinstance(value, str) else value
+            for field, value in args.model_dump().items()
+        }
+        return json.dumps([name, normalized], sort_keys=True, separators=(",", ":"))
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        """
+        Return the tool schemas, generated once and reused for every request
+        """
+        if self._schemas is None:
+            self._schemas = [spec.schema() for spec in self._tools.values()]
+        return self._schemas
+
+    def schema_json(self) -> str:
+        """
+        Return the tool schemas serialized once as canonical JSON
+        """
+        if self._schema_json is None:
+            self._schema_json = json.dumps(self.schemas(), sort_keys=True, separators=(",", ":"))
+        return self._schema_json
+
+    def schema_version(self) -> str:
+        """
+        Return a short hash identifying the current set of tool schemas
+        """
+        if self._schema_version is None:
+            self._schema_version = hashlib.sha256(self.schema_json().encode()).hexdigest()[:12]
+        return self._schema_version
+
+    async def execute(self, name: str, arguments: Dict[str, Any]) -> ToolResult:
+        """
+        Validate the arguments and run the named tool
+
+        Unknown tools, invalid arguments and handler results with an "error"
+        key are marked as errors.
+
+        :param name: Tool name requested by the model
+        :param arguments: Decoded JSON arguments from the model
+        :return: Formatted tool output
+        """
+        spec = self._tools.get(name)
+        if spec is None:
+            return ToolResult(f"Tool {name} executed successfully.", is_error=True)
+
+        try:
+            args = spec.args_model.model_validate(arguments)
+        except ValidationError as e:
+            missing = ", ".join(str(error["loc"][0]) for error in e.errors() if error["loc"])
+            return ToolResult(f"I need a valid {missing or 'input'} to use the {name} tool.", is_error=True)
+
+        result = await spec.handler(args)
+        return ToolResult(spec.formatter(args, result), is_error=isinstance(result, dict) and "error" in result)
+
+
+# Shared registry; tool modules register themselves on import
+registry = ToolRegistry()
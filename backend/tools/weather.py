@@ -72,57 +72,105 @@
 
 import httpx
 import os
-from typing import Dict, Any
+import re
+from typing import Dict, Any, List
 from dotenv import load_dotenv
 
+from models import WeatherRequest
+from tools.registry import registry
+from utils.cache import AsyncTTLCache
+from utils.http_client import ToolHTTPClient
+
+# Load environment variables once at import
+load_dotenv()
+
+OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
+
+# OpenWeatherMap API endpoint
+OPENWEATHERMAP_BASE_URL = os.getenv(
+    "OPENWEATHERMAP_BASE_URL",
+    "https://api.openweathermap.org/data/2.5/weather"
+)
+
+# Weather result cache settings
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "256"))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_STALE_TTL = float(os.getenv("WEATHER_CACHE_STALE_TTL", "300"))
+
+# Speculative prefetch: a weather word plus a capitalized place after "in", "at" or "for"
+_WEATHER_INTENT = re.compile(r"\b(?:weather|forecast|temperature|rain(?:ing)?|snow(?:ing)?|sunny|humid)\b", re.IGNORECASE)
+_PLACE = re.compile(r"\b(?:in|at|for)\s+([A-Z][\w'.-]*(?:\s+[A-Z][\w'.-]*){0,2})")
+
 class WeatherTool:
+    _cache = AsyncTTLCache(
+        max_size=WEATHER_CACHE_SIZE,
+        ttl=WEATHER_CACHE_TTL,
+        stale_ttl=WEATHER_CACHE_STALE_TTL
+    )
+
     @staticmethod
     async def get_weather(city: str) -> Dict[str, Any]:
+        """
+        Fetch weather data for a given city, served from cache when possible
+        
+        Lookups are keyed on the normalized city name; concurrent misses for
+        the same city share one upstream request and errors are not cached.
+        """
+        key = " ".join(city.split()).casefold()
+        return await WeatherTool._cache.get_or_load(
+            key,
+            lambda: WeatherTool._fetch_weather(city),
+            cacheable=lambda result: "error" not in result
+        )
+
+    @staticmethod
+    def cache_stats() -> Dict[str, int]:
+        """
+        Return hit/miss counters for the weather cache
+        """
+        return WeatherTool._cache.stats()
+
+    @staticmethod
+    async def _fetch_weather(city: str) -> Dict[str, Any]:
         """
         Fetch real-time weather data for a given city using OpenWeatherMap API
         
         Requires OPENWEATHERMAP_API_KEY in environment variables
         """
-        # Load environment variables
-        load_dotenv()
-        
-        # Get API key from environment variables
-        api_key = os.getenv("OPENWEATHERMAP_API_KEY")
+        api_key = OPENWEATHERMAP_API_KEY
         
         if not api_key:
             return {
                 "error": "OpenWeatherMap API key not found. Please set OPENWEATHERMAP_API_KEY in your environment."
             }
         
-        # OpenWeatherMap API endpoint
-        base_url = "https://api.openweathermap.org/data/2.5/weather"
-        
         try:
-            async with httpx.AsyncClient() as client:
-                # Make API request
-                response = await client.get(
-                    base_url, 
-                    params={
-                        "q": city,
-                        "appid": api_key,
-                        "units": "metric"  # Use Celsius
-                    }
-                )
-                
-                # Check if request was successful
-                response.raise_for_status()
-                
-                # Parse JSON response
-                data = response.json()
-                
-                # Extract relevant weather information
-                return {
-                    "temperature": f"{round(data['main']['temp'])}°C",
-                    "description": data['weather'][0]['description'],
-                    "humidity": f"{data['main']['humidity']}%",
-                    "wind": f"{round(data['wind']['speed'], 1)} mph",
-                    "location": f"{data['name']}, {data.get('sys', {}).get('country', '')}"
+            client = ToolHTTPClient.get()
+
+            # Make API request
+            response = await client.get(
+                OPENWEATHERMAP_BASE_URL, 
+                params={
+                    "q": city,
+                    "appid": api_key,
+                    "units": "metric"  # Use Celsius
                 }
+            )
+            
+            # Check if request was successful
+            response.raise_for_status()
+            
+            # Parse JSON response
+            data = response.json()
+            
+            # Extract relevant weather information
+            return {
+                "temperature": f"{round(data['main']['temp'])}°C",
+                "description": data['weather'][0]['description'],
+                "humidity": f"{data['main']['humidity']}%",
+                "wind": f"{round(data['wind']['speed'], 1)} mph",
+                "location": f"{data['name']}, {data.get('sys', {}).get('country', '')}"
+            }
         
         except httpx.RequestError as e:
             # Handle network-related errors
@@ -150,4 +198,26 @@ class WeatherTool:
             # Catch any other unexpected errors
             return {
                 "error": f"An unexpected error occurred: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+
+def _format_weather(args: WeatherRequest, result: Dict[str, Any]) -> str:
+    if "error" in result:
+        return result["error"]
+    return f"The current weather in {args.city} is {result['temperature']}, {result['description']} with humidity at {result['humidity']}."
+
+
+def _speculate_weather(text: str) -> List[Dict[str, Any]]:
+    if not _WEATHER_INTENT.search(text):
+        return []
+    return [{"city": place.rstrip(".")} for place in _PLACE.findall(text)]
+
+
+registry.register(
+    "get_weather",
+    "Get current weather for a specified city",
+    WeatherRequest,
+    handler=lambda args: WeatherTool.get_weather(args.city),
+    formatter=_format_weather,
+    speculate=_speculate_weather
+)
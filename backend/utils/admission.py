@@ -0,0 +1,308 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Priorities for admission; lower values are served first
+PRIORITY_IN_PROGRESS = 0
+PRIORITY_NEW = 1
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when the upstream wait queue is full
+    """
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        """
+        Token bucket limiter; a rate of 0 disables limiting
+
+        :param rate_per_second: Tokens added per second
+        :param capacity: Maximum burst size
+        """
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for a while, e.g. after the provider sent Retry-After
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def time_until_available(self) -> float:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.rate <= 0:
+            return 0.0
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def take(self) -> None:
+        if self.rate > 0:
+            self._tokens -= 1
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, cooldown: float):
+        """
+        Opens after consecutive upstream failures and lets a single probe through
+        once the cooldown has passed
+
+        :param failure_threshold: Consecutive failures that open the circuit
+        :param cooldown: Seconds the circuit stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def time_until_allowed(self) -> float:
+        """
+        Return 0 if a call may proceed now, otherwise seconds to wait before asking again
+
+        Only reads the state; the half-open probe is taken with claim_probe().
+        """
+        if self.state == "closed":
+            return 0.0
+        if self.state == "open":
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining > 0:
+                return remaining
+        if not self._probe_in_flight:
+            return 0.0
+        return min(1.0, self.cooldown)
+
+    def claim_probe(self) -> bool:
+        """
+        Mark an admitted call as the half-open probe when the circuit is not closed
+
+        Call only once the call has been given a permit, right after
+        time_until_allowed() returned 0.
+
+        :return: Whether the call is the probe and must report its outcome
+        """
+        if self.state == "closed":
+            return False
+        self.state = "half_open"
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_abandoned(self) -> None:
+        """
+        Free the half-open probe when its call ended without an upstream verdict
+        """
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Read Retry-After (seconds or HTTP date) or retry-after-ms from an HTTP error response
+    """
+    response: Optional[httpx.Response] = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        return float(headers["retry-after-ms"]) / 1000
+    except (KeyError, ValueError):
+        pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        max_waiting: int,
+        max_retries: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+        failure_threshold: int,
+        cooldown: float,
+        is_retryable: Callable[[Exception], bool]
+    ):
+        """
+        Rate limiting, priority queueing, retries and circuit breaking for upstream calls
+
+        Requests wait in a bounded priority queue for a token, so a traffic
+        spike or a provider 429 turns into queueing rather than failures.
+
+        :param rate_per_minute: Provider request quota; 0 disables rate limiting
+        :param burst: Requests allowed at once above the steady rate
+        :param max_waiting: Maximum number of queued requests
+        :param max_retries: Retries after a retryable failure
+        :param retry_base_delay: Base delay for jittered exponential backoff
+        :param retry_max_delay: Upper bound for one backoff delay
+        :param failure_threshold: Consecutive failures that open the circuit
+        :param cooldown: Seconds the circuit stays open
+        :param is_retryable: Decides whether an exception is transient
+        """
+        self.bucket = TokenBucket(rate_per_minute / 60, max(1, burst))
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+        self.max_waiting = max_waiting
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.is_retryable = is_retryable
+
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        # Queued requests still waiting; abandoned ones stay in _waiters until the pump pops them
+        self._live_waiters = 0
+        self._sequence = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.retries = 0
+
+    async def acquire(self, priority: int) -> bool:
+        """
+        Wait for permission to send one upstream request
+
+        :param priority: PRIORITY_IN_PROGRESS or PRIORITY_NEW
+        :return: Whether the request is the circuit breaker's half-open probe
+        :raises AdmissionRejected: If the wait queue is full
+        """
+        if not self._live_waiters and self.breaker.time_until_allowed() == 0 and self.bucket.time_until_available() == 0:
+            self.bucket.take()
+            self.admitted += 1
+            return self.breaker.claim_probe()
+
+        if self._live_waiters >= self.max_waiting:
+            self.rejected += 1
+            raise AdmissionRejected("Upstream wait queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self._live_waiters += 1
+        self.queued += 1
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                # Gave up before its turn; the pump discards the entry later
+                self._live_waiters -= 1
+            elif waiter.result():
+                # Cancelled after being handed the probe; let another request probe
+                self.breaker.record_abandoned()
+            raise
+
+    async def call(self, attempt: Callable[[], Awaitable[Any]], priority: int) -> Any:
+        """
+        Run an upstream call with admission, retries and circuit breaking
+
+        :param attempt: Coroutine factory performing one try
+        :param priority: PRIORITY_IN_PROGRESS or PRIORITY_NEW
+        :return: Result of the first successful try
+        """
+        for retry in range(self.max_retries + 1):
+            probe = False
+            try:
+                probe = await self.acquire(priority)
+                result = await attempt()
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                if not self.is_retryable(e):
+                    # The provider answered, so it is reachable
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if retry == self.max_retries:
+                    raise
+
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** retry))
+                retry_after = retry_after_seconds(e)
+                if retry_after is not None:
+                    # The quota is shared, so hold back every queued request too
+                    self.bucket.pause(retry_after)
+                    delay = retry_after + random.uniform(0, self.retry_base_delay)
+                self.retries += 1
+                logger.warning("Retrying upstream call in %.2fs after %s: %s", delay, type(e).__name__, e)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled by the caller's deadline or a disconnect
+                if probe:
+                    self.breaker.record_abandoned()
+                raise
+
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "waiting": self._live_waiters,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "circuit_state": self.breaker.state,
+            "circuit_opened": self.breaker.opened
+        }
+
+    async def _pump(self) -> None:
+        # Hands out permits to queued requests, best priority first
+        while self._waiters:
+            wait = max(self.breaker.time_until_allowed(), self.bucket.time_until_available())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                # The caller gave up (deadline or disconnect) before its turn
+                continue
+            # The permit and the probe are handed out together, so a probe is
+            # never claimed for a request that is still waiting for a token
+            self.bucket.take()
+            self.admitted += 1
+            self._live_waiters -= 1
+            waiter.set_result(self.breaker.claim_probe())
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTTLCache:
+    def __init__(self, max_size: int, ttl: float, stale_ttl: float = 0):
+        """
+        Bounded LRU cache for async lookups with TTL expiry
+
+        Entries older than ttl but within ttl + stale_ttl are served while a
+        background refresh runs. Concurrent misses for the same key share a
+        single in-flight load.
+
+        :param max_size: Maximum number of entries before LRU eviction
+        :param ttl: Seconds an entry is served as fresh
+        :param stale_ttl: Extra seconds an expired entry may be served while
+                          it is refreshed in the background
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Return the cached value for key, loading it on a miss
+
+        :param key: Cache key
+        :param loader: Coroutine factory producing the value
+        :param cacheable: Predicate deciding whether a loaded value is stored
+        :return: Cached or freshly loaded value
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start_load(key, loader, cacheable)
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._start_load(key, loader, cacheable)
+
+        # Shield the shared load so one caller's cancellation doesn't abort it for the rest
+        return await asyncio.shield(task)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return a fresh cached value without loading, or None
+        """
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entries if full
+        """
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return hit/miss counters and the current size
+        """
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions
+        }
+
+    def _start_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]]
+    ) -> asyncio.Task:
+        async def _load() -> Any:
+            value = await loader()
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+            return value
+
+        task = asyncio.ensure_future(_load())
+        self._inflight[key] = task
+
+        def _done(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            # Background refreshes have no awaiting caller, so retrieve the error here
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.warning("Cache load for %r failed: %s", key, finished.exception())
+
+        task.add_done_callback(_done)
+        return task
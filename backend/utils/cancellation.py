@@ -0,0 +1,100 @@
+import asyncio
+import contextvars
+import logging
+from typing import AsyncGenerator, AsyncIterator, Dict, Optional
+
+from utils.metrics import QUERY_CANCELLED
+
+logger = logging.getLogger(__name__)
+
+# Stages a request passes through, reported when it is abandoned
+STAGE_QUEUED = "queued"
+STAGE_LLM = "llm"
+STAGE_TOOLS = "tools"
+STAGE_STREAM = "stream"
+
+# Scope of the request being handled; tasks spawned for it inherit it
+current_scope: contextvars.ContextVar[Optional["RequestScope"]] = contextvars.ContextVar("request_scope", default=None)
+
+
+def enter_stage(stage: str) -> None:
+    """
+    Record the stage the current request has reached, if it has a scope
+    """
+    scope = current_scope.get()
+    if scope is not None:
+        scope.stage = stage
+
+
+class RequestScope:
+    __slots__ = ("deadline", "stage", "finished")
+
+    def __init__(self, timeout: float):
+        """
+        Deadline and progress of the downstream work of one request
+
+        Everything the request starts, from the model call to tool calls and
+        the simulated typing of replayed text, runs inside guard(); when the
+        deadline passes or the client goes away, that work is cancelled.
+
+        :param timeout: Seconds from now until the request is abandoned
+        """
+        self.deadline = asyncio.get_running_loop().time() + timeout
+        self.stage = STAGE_QUEUED
+        self.finished = False
+
+    def bind(self) -> None:
+        """
+        Make this the scope of the current context and the tasks it spawns
+        """
+        current_scope.set(self)
+
+    def remaining(self) -> float:
+        return max(self.deadline - asyncio.get_running_loop().time(), 0)
+
+    def abandon(self, reason: str) -> None:
+        """
+        Count the request as stopped early, once
+
+        :param reason: "disconnect" or "deadline"
+        """
+        if self.finished:
+            return
+        self.finished = True
+        QUERY_CANCELLED.labels(reason, self.stage).inc()
+        logger.info("Request abandoned", extra={"reason": reason, "stage": self.stage})
+
+    async def guard(self, events: AsyncIterator[Dict[str, str]]) -> AsyncGenerator[Dict[str, str], None]:
+        """
+        Pass events through until the deadline
+
+        At the deadline the pending step of events is cancelled and an error
+        event is sent instead. If the consumer stops reading first, i.e. the
+        client disconnected, closing this generator closes events too.
+
+        :param events: SSE events of the response
+        :return: Async generator of the same events
+        """
+        iterator = events.__aiter__()
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout_at(self.deadline):
+                        event = await iterator.__anext__()
+                except StopAsyncIteration:
+                    self.finished = True
+                    return
+                except TimeoutError:
+                    self.abandon("deadline")
+                    yield {
+                        "event": "error",
+                        "data": "The response took too long and was stopped."
+                    }
+                    return
+                yield event
+        finally:
+            # Still unfinished here only when the consumer went away
+            self.abandon("disconnect")
+            close = getattr(iterator, "aclose", None)
+            if close is not None:
+                await close()
@@ -0,0 +1,118 @@
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Rough per-message framing cost in tokens (role, separators)
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English text)
+    """
+    return len(text) // 4 + 1
+
+
+def _message_tokens(message: Dict[str, str]) -> int:
+    return estimate_tokens(message.get("content") or "") + _MESSAGE_OVERHEAD_TOKENS
+
+
+class _SummaryState:
+    __slots__ = ("folded", "fingerprint", "lines", "tokens")
+
+    def __init__(self):
+        self.folded = 0
+        self.fingerprint: Optional[Tuple[str, int]] = None
+        self.lines: Deque[str] = deque()
+        self.tokens = 0
+
+
+class ContextBuilder:
+    def __init__(self, token_budget: int, summary_tokens: int, summary_line_chars: int, max_sessions: int):
+        """
+        Fit session history into a token budget before it is sent to the model
+
+        The system prompt and the most recent turns are kept verbatim; older
+        turns are folded into a rolling summary that is extended incrementally
+        as more turns fall out of the window.
+
+        :param token_budget: Target prompt size in estimated tokens
+        :param summary_tokens: Token budget reserved for the rolling summary
+        :param summary_line_chars: Characters kept from each folded message
+        :param max_sessions: Number of per-session summaries kept in memory
+        """
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summary_line_chars = summary_line_chars
+        self.max_sessions = max_sessions
+        self._summaries: "OrderedDict[str, _SummaryState]" = OrderedDict()
+
+    def build(self, session_id: str, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Return the messages to send for this turn
+
+        :param session_id: Unique session identifier
+        :param messages: Full history, system prompt first and current query last
+        :return: History trimmed to the budget, with a summary of older turns
+        """
+        system, history = messages[0], messages[1:]
+        if sum(_message_tokens(message) for message in messages) <= self.token_budget:
+            return messages
+
+        # Walk back from the newest message while the window fits
+        used = _message_tokens(system) + self.summary_tokens + _MESSAGE_OVERHEAD_TOKENS
+        keep_from = len(history)
+        while keep_from > 0 and used + _message_tokens(history[keep_from - 1]) <= self.token_budget:
+            keep_from -= 1
+            used += _message_tokens(history[keep_from])
+
+        # Always send the current query, and start the window on a user turn
+        keep_from = min(keep_from, len(history) - 1)
+        while keep_from < len(history) - 1 and history[keep_from]["role"] != "user":
+            keep_from += 1
+
+        summary = self._fold(session_id, history, keep_from)
+        if not summary:
+            return [system] + history[keep_from:]
+
+        return [
+            system,
+            {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+        ] + history[keep_from:]
+
+    def forget(self, session_id: str) -> None:
+        self._summaries.pop(session_id, None)
+
+    def _fold(self, session_id: str, history: List[Dict[str, str]], keep_from: int) -> str:
+        state = self._summaries.get(session_id)
+
+        # Reuse the previous summary only if it still describes a prefix of this history
+        if state is None or state.folded > keep_from or (
+            state.folded and self._fingerprint(history[state.folded - 1]) != state.fingerprint
+        ):
+            state = _SummaryState()
+
+        for message in history[state.folded:keep_from]:
+            content = " ".join((message.get("content") or "").split())
+            if len(content) > self.summary_line_chars:
+                content = content[:self.summary_line_chars].rstrip() + "..."
+            line = f"{message['role']}: {content}"
+            state.lines.append(line)
+            state.tokens += estimate_tokens(line)
+
+        # Oldest lines fall out once the summary exceeds its budget
+        while len(state.lines) > 1 and state.tokens > self.summary_tokens:
+            state.tokens -= estimate_tokens(state.lines.popleft())
+
+        state.folded = keep_from
+        state.fingerprint = self._fingerprint(history[keep_from - 1]) if keep_from else None
+
+        self._summaries[session_id] = state
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.max_sessions:
+            self._summaries.popitem(last=False)
+
+        return "\n".join(state.lines)
+
+    @staticmethod
+    def _fingerprint(message: Dict[str, str]) -> Tuple[str, int]:
+        return message["role"], hash(message.get("content") or "")
@@ -0,0 +1,488 @@
+import asyncio
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Approximate per-record cost of a slotted Message plus its list slot
+_RECORD_OVERHEAD = sys.getsizeof(object()) + 2 * 8 + 8
+
+
+class Message:
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str):
+        self.role = sys.intern(role)
+        self.content = content
+
+    @property
+    def nbytes(self) -> int:
+        return _RECORD_OVERHEAD + sys.getsizeof(self.content)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+class Session:
+    __slots__ = ("messages", "nbytes", "last_access")
+
+    def __init__(self):
+        self.messages: List[Message] = []
+        self.nbytes = 0
+        self.last_access = time.monotonic()
+
+
+class ConversationStore:
+    def __init__(self, system_prompt: str, max_sessions: int, idle_ttl: float, max_bytes: int):
+        """
+        In-memory conversation history with LRU, idle-TTL and byte-budget eviction
+
+        Messages are kept as slotted records and the system prompt is stored
+        once and shared by every session.
+
+        :param system_prompt: System prompt prepended to every session
+        :param max_sessions: Maximum number of sessions kept
+        :param idle_ttl: Seconds after the last access before a session expires
+        :param max_bytes: Approximate byte budget across all sessions
+        """
+        self.system_message = Message("system", sys.intern(system_prompt))
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.total_bytes = 0
+        self.total_messages = 0
+        self.evictions = {"lru": 0, "idle": 0, "budget": 0}
+        self.trimmed_messages = 0
+
+    def get_messages(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        Return the session history as message dictionaries, system prompt first
+
+        :param session_id: Unique session identifier
+        :return: List of {"role", "content"} dictionaries
+        """
+        self._expire_idle()
+        session = self._sessions.get(session_id)
+        messages = [self.system_message.to_dict()]
+        if session is None:
+            return messages
+
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        messages.extend(message.to_dict() for message in session.messages)
+        return messages
+
+    def append(self, session_id: str, turns: Iterable[Tuple[str, str]]) -> None:
+        """
+        Append (role, content) messages to a session, creating it if needed
+
+        :param session_id: Unique session identifier
+        :param turns: Messages to append, in order
+        """
+        self._expire_idle()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session()
+
+        for role, content in turns:
+            message = Message(role, content)
+            session.messages.append(message)
+            session.nbytes += message.nbytes
+            self.total_bytes += message.nbytes
+            self.total_messages += 1
+
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        self._enforce_limits(session_id)
+
+    def delete(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self.total_bytes -= session.nbytes
+            self.total_messages -= len(session.messages)
+
+    # Async counterparts shared with SQLiteConversationStore; nothing here blocks
+    async def aget_messages(self, session_id: str) -> List[Dict[str, str]]:
+        return self.get_messages(session_id)
+
+    async def aappend(self, session_id: str, turns: Iterable[Tuple[str, str]]) -> None:
+        self.append(session_id, turns)
+
+    async def astats(self) -> Dict[str, int]:
+        return self.stats()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return size, byte accounting and eviction counters
+        """
+        return {
+            "sessions": len(self._sessions),
+            "messages": self.total_messages,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted_lru": self.evictions["lru"],
+            "evicted_idle": self.evictions["idle"],
+            "evicted_budget": self.evictions["budget"],
+            "trimmed_messages": self.trimmed_messages
+        }
+
+    def _evict_oldest(self, reason: str) -> None:
+        _, session = self._sessions.popitem(last=False)
+        self.total_bytes -= session.nbytes
+        self.total_messages -= len(session.messages)
+        self.evictions[reason] += 1
+
+    def _expire_idle(self) -> None:
+        # Sessions are ordered by last access, so expired ones sit at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_access > cutoff:
+                break
+            self._evict_oldest("idle")
+
+    def _enforce_limits(self, current_id: str) -> None:
+        while len(self._sessions) > self.max_sessions:
+            self._evict_oldest("lru")
+
+        while self.total_bytes > self.max_bytes and len(self._sessions) > 1:
+            self._evict_oldest("budget")
+
+        # A single session over budget loses its oldest messages instead
+        session = self._sessions.get(current_id)
+        while self.total_bytes > self.max_bytes and session is not None and len(session.messages) > 1:
+            message = session.messages.pop(0)
+            session.nbytes -= message.nbytes
+            self.total_bytes -= message.nbytes
+            self.total_messages -= 1
+            self.trimmed_messages += 1
+
+
+class _CachedSession:
+    __slots__ = ("version", "messages")
+
+    def __init__(self, version: int, messages: List[Message]):
+        self.version = version
+        self.messages = messages
+
+
+class SQLiteConversationStore:
+    def __init__(
+        self,
+        db_path: str,
+        system_prompt: str,
+        max_sessions: int,
+        idle_ttl: float,
+        max_bytes: int,
+        cache_sessions: int,
+        sweep_interval: float = 5.0
+    ):
+        """
+        Conversation history shared by every worker process on the host
+
+        Sessions live in a SQLite database in WAL mode, so any worker can
+        continue any session. Each process keeps a write-through LRU cache
+        of recent sessions; a read checks the session's version in SQLite
+        and only reloads its messages when another process has appended
+        since. Eviction by idle time, session count and byte budget runs in
+        periodic sweeps over the shared tables (see run_sweeper).
+
+        Database calls can wait up to busy_timeout for another worker's write
+        lock, so async callers use the a* methods, which run them on a
+        dedicated thread instead of the event loop.
+
+        :param db_path: SQLite database file shared by the workers
+        :param system_prompt: System prompt prepended to every session
+        :param max_sessions: Maximum number of sessions kept
+        :param idle_ttl: Seconds after the last write before a session expires
+        :param max_bytes: Approximate byte budget across all sessions
+        :param cache_sessions: Sessions cached in this process
+        :param sweep_interval: Seconds between eviction sweeps
+        """
+        self.system_message = Message("system", sys.intern(system_prompt))
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.cache_sessions = cache_sessions
+        self.sweep_interval = sweep_interval
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Calls are serialized by the lock anyway; one thread keeps them from
+        # tying up the default executor while they wait for SQLite
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-db")
+        self.evictions = {"lru": 0, "idle": 0, "budget": 0}
+        self.trimmed_messages = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # Writers from other workers wait for the lock instead of failing
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                next_seq INTEGER NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                nbytes INTEGER NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def get_messages(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        Return the session history as message dictionaries, system prompt first
+
+        :param session_id: Unique session identifier
+        :return: List of {"role", "content"} dictionaries
+        """
+        messages = [self.system_message.to_dict()]
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                self._cache.pop(session_id, None)
+                return messages
+
+            cached = self._cache.get(session_id)
+            if cached is not None and cached.version == row[0]:
+                self.cache_hits += 1
+                self._cache.move_to_end(session_id)
+            else:
+                # Missing here, or another worker has appended since it was cached
+                self.cache_misses += 1
+                cached = self._load(session_id, row[0])
+
+        messages.extend(message.to_dict() for message in cached.messages)
+        return messages
+
+    def append(self, session_id: str, turns: Iterable[Tuple[str, str]]) -> None:
+        """
+        Append (role, content) messages to a session, creating it if needed
+
+        :param session_id: Unique session identifier
+        :param turns: Messages to append, in order
+        """
+        new_messages = [Message(role, content) for role, content in turns]
+        added_bytes = sum(message.nbytes for message in new_messages)
+        now = time.time()
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT version, next_seq, nbytes FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                version, next_seq, nbytes = row if row is not None else (0, 0, 0)
+                self._db.executemany(
+                    "INSERT INTO messages (session_id, seq, role, content, nbytes) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (session_id, next_seq + offset, message.role, message.content, message.nbytes)
+                        for offset, message in enumerate(new_messages)
+                    ]
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, version, next_seq, nbytes, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (session_id, version + 1, next_seq + len(new_messages), nbytes + added_bytes, now)
+                )
+                trimmed = self._trim(session_id, nbytes + added_bytes)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                self._cache.pop(session_id, None)
+                raise
+
+            # Write through when the cached copy was current before this append
+            cached = self._cache.get(session_id)
+            if cached is not None and cached.version == version and not trimmed:
+                cached.messages.extend(new_messages)
+                cached.version = version + 1
+                self._cache.move_to_end(session_id)
+            elif row is None and not trimmed:
+                self._remember(session_id, _CachedSession(1, new_messages))
+            else:
+                self._cache.pop(session_id, None)
+
+    async def aget_messages(self, session_id: str) -> List[Dict[str, str]]:
+        return await self._run(self.get_messages, session_id)
+
+    async def aappend(self, session_id: str, turns: Iterable[Tuple[str, str]]) -> None:
+        await self._run(self.append, session_id, list(turns))
+
+    async def astats(self) -> Dict[str, int]:
+        return await self._run(self.stats)
+
+    def sweep(self) -> None:
+        """
+        Run one eviction sweep over the shared tables
+        """
+        with self._lock:
+            self._sweep(time.time())
+
+    async def run_sweeper(self) -> None:
+        """
+        Sweep every sweep_interval seconds until cancelled
+        """
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self._run(self.sweep)
+            except Exception:
+                logger.exception("Conversation sweep failed")
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._delete_sessions([session_id])
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return shared size and byte accounting plus this process's counters
+        """
+        with self._lock:
+            sessions, total_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM sessions"
+            ).fetchone()
+            messages = self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return {
+            "sessions": sessions,
+            "messages": messages,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted_lru": self.evictions["lru"],
+            "evicted_idle": self.evictions["idle"],
+            "evicted_budget": self.evictions["budget"],
+            "trimmed_messages": self.trimmed_messages,
+            "cached_sessions": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._db.close()
+
+    async def _run(self, method: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+    def _load(self, session_id: str, version: int) -> _CachedSession:
+        rows = self._db.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        cached = _CachedSession(version, [Message(role, content) for role, content in rows])
+        self._remember(session_id, cached)
+        return cached
+
+    def _remember(self, session_id: str, cached: _CachedSession) -> None:
+        self._cache[session_id] = cached
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_sessions:
+            self._cache.popitem(last=False)
+
+    def _trim(self, session_id: str, nbytes: int) -> int:
+        # A single session over the whole budget loses its oldest messages
+        trimmed = 0
+        if nbytes <= self.max_bytes:
+            return trimmed
+        rows = self._db.execute(
+            "SELECT seq, nbytes FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        for seq, message_bytes in rows[:-1]:
+            if nbytes <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM messages WHERE session_id = ? AND seq = ?", (session_id, seq))
+            nbytes -= message_bytes
+            trimmed += 1
+        self._db.execute("UPDATE sessions SET nbytes = ? WHERE session_id = ?", (nbytes, session_id))
+        self.trimmed_messages += trimmed
+        return trimmed
+
+    def _sweep(self, now: float) -> None:
+        """
+        Evict idle sessions, then the least recently written ones over the count and byte limits
+        """
+        expired = [
+            row[0] for row in self._db.execute(
+                "SELECT session_id FROM sessions WHERE last_access < ?", (now - self.idle_ttl,)
+            )
+        ]
+        self.evictions["idle"] += self._delete_sessions(expired)
+
+        count, total_bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM sessions"
+        ).fetchone()
+        if count <= self.max_sessions and total_bytes <= self.max_bytes:
+            return
+
+        over_count = []
+        over_budget = []
+        # Keep the most recent session even if it alone exceeds the budget
+        for session_id, nbytes in self._db.execute(
+            "SELECT session_id, nbytes FROM sessions ORDER BY last_access LIMIT ?", (max(count - 1, 0),)
+        ).fetchall():
+            if count > self.max_sessions:
+                over_count.append(session_id)
+            elif total_bytes > self.max_bytes:
+                over_budget.append(session_id)
+            else:
+                break
+            count -= 1
+            total_bytes -= nbytes
+        self.evictions["lru"] += self._delete_sessions(over_count)
+        self.evictions["budget"] += self._delete_sessions(over_budget)
+
+    def _delete_sessions(self, session_ids: List[str]) -> int:
+        if not session_ids:
+            return 0
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = 0
+            for session_id in session_ids:
+                self._cache.pop(session_id, None)
+                self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                deleted += self._db.execute(
+                    "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+                ).rowcount
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return deleted
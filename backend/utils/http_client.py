@@ -0,0 +1,92 @@
+import os
+import asyncio
+import logging
+import httpx
+from typing import Iterable, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Outbound HTTP settings for tool calls, read once at import
+TOOL_HTTP_CONNECT_TIMEOUT = float(os.getenv("TOOL_HTTP_CONNECT_TIMEOUT", "3"))
+TOOL_HTTP_READ_TIMEOUT = float(os.getenv("TOOL_HTTP_READ_TIMEOUT", "5"))
+TOOL_HTTP_MAX_CONNECTIONS = int(os.getenv("TOOL_HTTP_MAX_CONNECTIONS", "50"))
+TOOL_HTTP_MAX_KEEPALIVE = int(os.getenv("TOOL_HTTP_MAX_KEEPALIVE", "10"))
+TOOL_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("TOOL_HTTP_KEEPALIVE_EXPIRY", "30"))
+TOOL_HTTP2 = os.getenv("TOOL_HTTP2", "false").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+
+class ToolHTTPClient:
+    _client: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    async def startup(cls) -> None:
+        """
+        Open the shared client at application startup
+        """
+        cls.get()
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """
+        Close the shared client and its pooled connections
+        """
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
+    @classmethod
+    async def prewarm(cls, urls: Iterable[str]) -> None:
+        """
+        Open pooled connections to tool upstreams before the first tool call
+
+        Sends one HEAD request to the root of each distinct host; any HTTP
+        response will do, only connection failures raise.
+
+        :param urls: Upstream URLs used by tools
+        """
+        client = cls.get()
+        origins = {str(httpx.URL(url).join("/")) for url in urls if url}
+        await asyncio.gather(*(client.head(origin) for origin in origins))
+
+    @classmethod
+    def get(cls) -> httpx.AsyncClient:
+        """
+        Return the app-lifetime client used by tools for outbound requests
+
+        The client is created on first use if startup has not run yet, e.g.
+        when a tool is called from a script.
+
+        :return: Shared httpx.AsyncClient with keep-alive pooling
+        """
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                http2=cls._http2_enabled(),
+                limits=httpx.Limits(
+                    max_connections=TOOL_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=TOOL_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=TOOL_HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(
+                    TOOL_HTTP_READ_TIMEOUT,
+                    connect=TOOL_HTTP_CONNECT_TIMEOUT
+                )
+            )
+        return cls._client
+
+    @staticmethod
+    def _http2_enabled() -> bool:
+        """
+        HTTP/2 needs the optional h2 package (pip install httpx[http2])
+        """
+        if not TOOL_HTTP2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("TOOL_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+            return False
+        return True
@@ -0,0 +1,137 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fallback for cold-start timing where /proc is not available
+_MODULE_LOADED = time.time()
+
+STARTUP_STEP_SECONDS = metrics.gauge(
+    "startup_step_seconds",
+    "Duration of each application startup step",
+    ["step"]
+)
+TIME_TO_READY_SECONDS = metrics.gauge(
+    "startup_time_to_ready_seconds",
+    "Time from process start until the application reported ready"
+)
+
+# Dependency states reported by /healthz and /readyz
+PENDING = "pending"
+OK = "ok"
+FAILED = "failed"
+
+
+def process_started_at() -> float:
+    """
+    Wall-clock time the current process was started
+
+    Read from /proc on Linux so interpreter start-up and imports are
+    included; elsewhere, when this module was first imported.
+    """
+    try:
+        with open("/proc/self/stat") as stat:
+            # The command name may contain spaces; fields resume after its ")"
+            start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            booted_at = time.time() - float(uptime.read().split()[0])
+        return booted_at + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return _MODULE_LOADED
+
+
+class StartupTracker:
+    def __init__(self):
+        """
+        Records startup step timings and the status of the app's dependencies
+
+        Required dependencies must be "ok" for the app to be ready; optional
+        ones, such as connection pre-warming, are reported but never block
+        readiness once they have finished.
+        """
+        self.started_at = process_started_at()
+        self.steps: Dict[str, float] = {}
+        self.dependencies: Dict[str, Dict[str, Any]] = {}
+        self.ready_at: Optional[float] = None
+        self.draining = False
+
+    def expect(self, name: str, required: bool = True) -> None:
+        """
+        Register a dependency that has not been checked yet
+        """
+        self.dependencies[name] = {"status": PENDING, "required": required}
+
+    def set_status(self, name: str, status: str, detail: Optional[str] = None, required: Optional[bool] = None) -> None:
+        entry = self.dependencies.setdefault(name, {"status": PENDING, "required": True})
+        entry["status"] = status
+        if required is not None:
+            entry["required"] = required
+        if detail is not None:
+            entry["detail"] = detail
+        else:
+            entry.pop("detail", None)
+
+    @contextmanager
+    def step(self, name: str, required: bool = True) -> Iterator[None]:
+        """
+        Time a startup step and record it as a dependency
+
+        A failing required step is re-raised; a failing optional step is
+        logged and recorded as failed.
+
+        :param name: Step and dependency name
+        :param required: Whether the app can serve without this step
+        """
+        self.expect(name, required)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.set_status(name, FAILED, f"{type(e).__name__}: {e}")
+            if required:
+                raise
+            logger.warning("Optional startup step failed", extra={"step": name, "error": repr(e)})
+        else:
+            self.set_status(name, OK)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.steps[name] = round(elapsed, 4)
+            STARTUP_STEP_SECONDS.labels(name).set(elapsed)
+
+    def is_ready(self) -> bool:
+        if self.draining:
+            return False
+        for entry in self.dependencies.values():
+            if entry["status"] == PENDING:
+                return False
+            if entry["required"] and entry["status"] != OK:
+                return False
+        return True
+
+    def mark_ready(self) -> None:
+        """
+        Record time-to-ready the first time every dependency has settled
+        """
+        if self.ready_at is not None or not self.is_ready():
+            return
+        self.ready_at = time.time()
+        TIME_TO_READY_SECONDS.set(self.ready_at - self.started_at)
+        logger.info("Application ready", extra={
+            "time_to_ready_ms": round((self.ready_at - self.started_at) * 1000, 1),
+            "steps_ms": {name: round(seconds * 1000, 1) for name, seconds in self.steps.items()}
+        })
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "draining": self.draining,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "time_to_ready_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at is not None else None,
+            "startup_steps_seconds": self.steps,
+            "dependencies": self.dependencies
+        }
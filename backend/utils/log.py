@@ -0,0 +1,163 @@
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Client libraries log every request at DEBUG; keep them quieter than our own code
+LOG_LIBRARY_LEVEL = os.getenv("LOG_LIBRARY_LEVEL", "WARNING").upper()
+_LIBRARY_LOGGERS = ("httpx", "httpcore", "groq", "sse_starlette")
+
+# Identifiers of the request being handled, attached to every record
+session_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Standard LogRecord attributes; anything else passed via extra= is emitted as a field
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "session_id", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        session_id = getattr(record, "session_id", None)
+        if session_id is not None:
+            entry["session_id"] = session_id
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key not in entry:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        """
+        Hands records to the background listener without blocking the event loop
+
+        Records are dropped, and counted, when the queue is full.
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Capture the request context here; the listener thread has its own
+        record.session_id = session_id_var.get()
+        record.request_id = request_id_var.get()
+        # Resolve arguments and tracebacks now so the record is safe to pickle or share
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    _handler: Optional[_ContextQueueHandler] = None
+    _listener: Optional[logging.handlers.QueueListener] = None
+
+    @classmethod
+    def start(cls) -> None:
+        """
+        Route all logging through a bounded queue drained by a background thread
+        """
+        if cls._listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter())
+
+        cls._handler = _ContextQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        cls._listener = logging.handlers.QueueListener(cls._handler.queue, output)
+        cls._listener.start()
+
+        root = logging.getLogger()
+        root.handlers = [cls._handler]
+        root.setLevel(LOG_LEVEL)
+        for name in _LIBRARY_LOGGERS:
+            logging.getLogger(name).setLevel(LOG_LIBRARY_LEVEL)
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Flush queued records and stop the background thread
+        """
+        if cls._listener is None:
+            return
+        cls._listener.stop()
+        cls._listener = None
+
+    @classmethod
+    def dropped(cls) -> int:
+        return cls._handler.dropped if cls._handler is not None else 0
+
+
+def bind_request(session_id: str, request_id: str) -> None:
+    """
+    Tag log records of the current request with its session and request IDs
+
+    Each request is served in its own task, and tasks it spawns (such as the
+    SSE response) inherit a copy of the context, so the IDs never leak across
+    requests.
+    """
+    session_id_var.set(session_id)
+    request_id_var.set(request_id)
+
+
+def truncate(payload: Any, max_chars: int = LOG_PAYLOAD_MAX_CHARS) -> str:
+    """
+    Render a payload for logging, cut to max_chars
+    """
+    text = payload if isinstance(payload, str) else repr(payload)
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... ({len(text)} chars)"
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, **fields: Any) -> None:
+    """
+    Log a potentially large payload at DEBUG, rendering it only when DEBUG is enabled
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, extra={"payload": truncate(payload), **fields})
+
+
+def sampled(rate: float = LOG_SAMPLE_RATE) -> bool:
+    """
+    Decide whether a high-volume event is logged this time
+    """
+    return rate >= 1 or random.random() < rate
+
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
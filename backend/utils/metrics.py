@@ -0,0 +1,252 @@
+import bisect
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.label_names:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values: str):
+        """
+        Return the child series for the given label values, creating it on first use
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(self._label_text(values), child))
+        return lines
+
+    def _label_text(self, values: Tuple[str, ...]) -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.label_names, values)]
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _render_child(self, labels: str, child) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def _render_child(self, labels: str, child: _Value) -> List[str]:
+        return [f"{self.name}{labels} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Per-bucket counts; cumulative totals are only computed when scraped
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, description, label_names)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.bounds)
+
+    def _render_child(self, labels: str, child: _HistogramValue) -> List[str]:
+        bucket_labels = labels[:-1] + "," if labels else "{"
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), child.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{bucket_labels}le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        In-process metric registry rendered in the Prometheus text format
+        """
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, description, label_names))
+
+    def gauge(self, name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, description, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        return self._add(Histogram(name, description, label_names, buckets or LATENCY_BUCKETS))
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+# Shared registry and the metrics recorded by the request path
+metrics = MetricsRegistry()
+
+QUERY_FIRST_EVENT_SECONDS = metrics.histogram(
+    "query_time_to_first_event_seconds",
+    "Time from receiving a /query or /query/resume request to sending its first SSE event",
+    ["route"]
+)
+QUERY_EVENTS = metrics.histogram(
+    "query_sse_events",
+    "SSE events sent per response, heartbeats excluded",
+    ["route"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+ACTIVE_STREAMS = metrics.gauge(
+    "query_active_streams",
+    "SSE responses currently being streamed",
+    ["route"]
+)
+LLM_COMPLETION_SECONDS = metrics.histogram(
+    "llm_completion_seconds",
+    "Total time of a Groq completion, including admission and retries",
+    ["mode"]
+)
+TOOL_SECONDS = metrics.histogram(
+    "tool_execution_seconds",
+    "Latency of one tool call",
+    ["tool"]
+)
+ERRORS = metrics.counter(
+    "errors_total",
+    "Errors by the stage they occurred in",
+    ["stage"]
+)
+FALLBACKS = metrics.counter(
+    "fallbacks_total",
+    "Fallback responses sent in place of a real result",
+    ["kind"]
+)
+LLM_ROUTED = metrics.counter(
+    "llm_routed_total",
+    "Completions by routing tier and chosen model",
+    ["tier", "model"]
+)
+LLM_HEDGES = metrics.counter(
+    "llm_hedges_total",
+    "Hedged completions by which call answered first",
+    ["outcome"]
+)
+LLM_FIRST_RESPONSE_SECONDS = metrics.histogram(
+    "llm_first_response_seconds",
+    "Time until the winning model's first chunk or full completion",
+    ["model"]
+)
+QUERY_CANCELLED = metrics.counter(
+    "query_cancelled_total",
+    "Responses stopped before completion, by reason and the stage they were in",
+    ["reason", "stage"]
+)
+CANCELLED_WORK = metrics.counter(
+    "cancelled_work_total",
+    "Model calls and tool executions stopped because their response was abandoned",
+    ["kind"]
+)
+TOOL_PREFETCH = metrics.counter(
+    "tool_prefetch_total",
+    "Speculative tool calls by tool and outcome: started, hit, miss or wasted",
+    ["tool", "outcome"]
+)
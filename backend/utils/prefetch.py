@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from tools.registry import registry
+from utils.metrics import TOOL_PREFETCH
+
+logger = logging.getLogger(__name__)
+
+STARTED = "started"
+HIT = "hit"
+MISS = "miss"
+WASTED = "wasted"
+
+
+class PrefetchBatch:
+    def __init__(self, prefetcher: "ToolPrefetcher"):
+        """
+        Speculative tool calls started for one model turn
+        """
+        self._prefetcher = prefetcher
+        self._tasks: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+    def add(self, name: str, arguments: Dict[str, Any], task: asyncio.Task) -> None:
+        self._tasks[registry.call_key(name, arguments)] = (name, task)
+
+    def claim(self, name: str, arguments: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """
+        Take over the speculative call matching a call the model made
+
+        :param name: Tool the model called
+        :param arguments: Decoded arguments of the call
+        :return: The running or finished task, or None if nothing matched
+        """
+        if not registry.is_speculative(name):
+            return None
+        key = registry.call_key(name, arguments)
+        entry = self._tasks.pop(key, None) if key is not None else None
+        self._prefetcher.record(name, HIT if entry is not None else MISS)
+        return entry[1] if entry is not None else None
+
+    def close(self) -> None:
+        """
+        Cancel the speculative calls the model never asked for
+        """
+        for name, task in self._tasks.values():
+            task.cancel()
+            self._prefetcher.record(name, WASTED)
+        self._tasks.clear()
+
+
+class ToolPrefetcher:
+    def __init__(self, enabled: bool, max_calls: int):
+        """
+        Runs side-effect-free tool calls predicted from the user's message
+        while the model is still generating
+
+        Only tools registered with a speculate function are predicted, so
+        tools with side effects never run speculatively. When the model asks
+        for a predicted call its result is handed over instead of running
+        the tool again.
+
+        :param enabled: Start speculative calls at all
+        :param max_calls: Most speculative calls started per turn
+        """
+        self.enabled = enabled
+        self.max_calls = max_calls
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def start(
+        self,
+        messages: List[Dict[str, str]],
+        run: Callable[[str, Dict[str, Any]], Awaitable[Any]]
+    ) -> Optional[PrefetchBatch]:
+        """
+        Predict and start the tool calls for the last user message
+
+        :param messages: Prompt messages, ending with the user's turn
+        :param run: Runs a tool call; used for both speculative and real calls
+        :return: Batch to claim results from, or None when disabled
+        """
+        if not self.enabled:
+            return None
+        batch = PrefetchBatch(self)
+        if not messages or messages[-1]["role"] != "user":
+            return batch
+        try:
+            calls = registry.speculative_calls(messages[-1]["content"] or "")
+        except Exception:
+            # Prediction is best effort and must never fail the turn
+            logger.exception("Tool call prediction failed")
+            return batch
+        for name, arguments in calls[:self.max_calls]:
+            batch.add(name, arguments, asyncio.create_task(run(name, arguments)))
+            self.record(name, STARTED)
+        return batch
+
+    def record(self, name: str, outcome: str) -> None:
+        counts = self._counts.setdefault(name, {STARTED: 0, HIT: 0, MISS: 0, WASTED: 0})
+        counts[outcome] += 1
+        TOOL_PREFETCH.labels(name, outcome).inc()
+
+    def stats(self) -> Dict[str, Any]:
+        tools = {}
+        for name, counts in self._counts.items():
+            asked = counts[HIT] + counts[MISS]
+            tools[name] = {
+                **counts,
+                # Share of the model's calls that were already running
+                "hit_rate": round(counts[HIT] / asked, 3) if asked else None,
+                # Share of speculative calls the model actually used
+                "precision": round(counts[HIT] / counts[STARTED], 3) if counts[STARTED] else None
+            }
+        return {"enabled": self.enabled, "max_calls": self.max_calls, "tools": tools}
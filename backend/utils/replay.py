@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncGenerator, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from utils.stream import HEARTBEAT_FRAME, SSE_HEARTBEAT_INTERVAL, StreamHelper
+
+logger = logging.getLogger(__name__)
+
+
+class ResumeGap(Exception):
+    """
+    Raised when the frames after a Last-Event-ID are no longer buffered
+    """
+
+
+# Ends a stream whose reader fell behind the frames still buffered
+GAP_FRAME = StreamHelper.encode_event(
+    "error",
+    "Part of the response could not be delivered. Please send your message again."
+)
+
+
+class ResponseLog:
+    def __init__(
+        self,
+        session_id: str,
+        request_id: str,
+        max_frames: int,
+        grace: float,
+        upstream: Optional["ResponseLog"] = None
+    ):
+        """
+        Encoded SSE frames of one response, readable by any number of connections
+
+        The response is produced by a background task, so a client that drops
+        its connection can reconnect and continue from its Last-Event-ID. When
+        the last reader leaves before the response is complete, the producer is
+        cancelled after `grace` seconds unless someone reconnects. The producer
+        never drops a frame that an attached reader has not sent yet; it waits
+        for the slowest reader instead.
+
+        :param session_id: Session the response belongs to
+        :param request_id: Request ID, used as the prefix of every event ID
+        :param max_frames: Frames kept; older ones can no longer be resumed from
+        :param grace: Seconds the response keeps running with no reader
+        :param upstream: Log of the response this one replays, as for a
+                         duplicate request; each reader here also counts as
+                         a reader there, so it keeps running
+        """
+        self.session_id = session_id
+        self.request_id = request_id
+        self.grace = grace
+        self.upstream = upstream
+        self.frames: Deque[Tuple[int, bytes]] = deque(maxlen=max_frames)
+        self.issued = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.readers = 0
+        self.resumes = 0
+        self.gaps = 0
+        # Last sequence number sent by each attached reader
+        self._positions: Dict[object, int] = {}
+        self._producer: Optional[asyncio.Task] = None
+        self._grace_timer: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Condition()
+
+    def next_id(self) -> str:
+        """
+        Issue the ID of the next event; frames are appended in issue order
+        """
+        self.issued += 1
+        return f"{self.request_id}-{self.issued}"
+
+    def start(self, frames: AsyncIterator[bytes]) -> None:
+        """
+        Produce the response in a background task that inherits the current context
+        """
+        self._producer = asyncio.create_task(self._produce(frames))
+
+    async def follow(self, after: int = 0, heartbeat_interval: float = SSE_HEARTBEAT_INTERVAL) -> AsyncGenerator[bytes, None]:
+        """
+        Send the frames after event `after`, then new ones as they are produced
+
+        :param after: Sequence number of the last event the client received
+        :param heartbeat_interval: Idle seconds before a heartbeat frame
+        :return: Async generator of encoded frames
+        """
+        reader = object()
+        self._attach()
+        self._positions[reader] = position = after
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout(heartbeat_interval):
+                        async with self._changed:
+                            # Publish progress so a producer waiting on this reader can continue
+                            self._positions[reader] = position
+                            self._changed.notify_all()
+                            await self._changed.wait_for(lambda: self.last_seq() > position or self.done)
+                except TimeoutError:
+                    yield HEARTBEAT_FRAME
+                    continue
+
+                while position < self.last_seq():
+                    # Sequence numbers are contiguous, so the next frame is found by
+                    # offset; recomputed per frame since the deque shifts while we yield
+                    first = self.frames[0][0]
+                    if position < first - 1:
+                        self.gaps += 1
+                        logger.warning(
+                            "Reader fell behind the buffered frames",
+                            extra={"request_id": self.request_id, "position": position, "first": first}
+                        )
+                        yield GAP_FRAME
+                        return
+                    seq, frame = self.frames[position - first + 1]
+                    position = seq
+                    yield frame
+                if self.done:
+                    return
+        finally:
+            self._detach()
+            async with self._changed:
+                # The producer may have been waiting on this reader
+                del self._positions[reader]
+                self._changed.notify_all()
+
+    def last_seq(self) -> int:
+        return self.frames[-1][0] if self.frames else 0
+
+    def can_resume_after(self, after: int) -> bool:
+        return not self.frames or after >= self.frames[0][0] - 1
+
+    def cancel(self) -> None:
+        if self._producer is not None and not self._producer.done():
+            self._producer.cancel()
+
+    async def _produce(self, frames: AsyncIterator[bytes]) -> None:
+        try:
+            async for frame in frames:
+                if frame is HEARTBEAT_FRAME:
+                    # Readers send their own heartbeats
+                    continue
+                async with self._changed:
+                    await self._changed.wait_for(self._has_room)
+                    self.frames.append((self.issued, frame))
+                    self._changed.notify_all()
+        except Exception:
+            # Nobody awaits the producer, so report its failure here
+            logger.exception("Response producer failed", extra={"request_id": self.request_id})
+        finally:
+            async with self._changed:
+                self.done = True
+                self.finished_at = time.monotonic()
+                self._changed.notify_all()
+            if self._grace_timer is not None:
+                self._grace_timer.cancel()
+                self._grace_timer = None
+
+    def _has_room(self) -> bool:
+        """
+        Whether a frame can be appended without dropping one an attached reader still needs
+        """
+        if len(self.frames) < self.frames.maxlen or not self._positions:
+            return True
+        return min(self._positions.values()) >= self.frames[0][0]
+
+    def _attach(self) -> None:
+        self.readers += 1
+        if self._grace_timer is not None:
+            self._grace_timer.cancel()
+            self._grace_timer = None
+        if self.upstream is not None:
+            self.upstream._attach()
+
+    def _detach(self) -> None:
+        self.readers -= 1
+        if self.readers == 0 and not self.done:
+            self._grace_timer = asyncio.get_running_loop().call_later(self.grace, self.cancel)
+        if self.upstream is not None:
+            self.upstream._detach()
+
+
+class ReplayBuffer:
+    def __init__(self, max_responses: int, ttl: float, max_frames: int, grace: float):
+        """
+        Recent responses by (session ID, request ID), for resuming dropped streams
+
+        Responses stay available while they run and for `ttl` seconds after
+        they finish. When more than max_responses are kept, the responses that
+        finished longest ago are dropped first. A running response is never
+        dropped; if all of them are running, the new response is streamed
+        without being buffered and cannot be resumed.
+
+        :param max_responses: Maximum number of responses kept
+        :param ttl: Seconds a finished response stays resumable
+        :param max_frames: Frames kept per response
+        :param grace: Seconds a response keeps running with no reader
+        """
+        self.max_responses = max_responses
+        self.ttl = ttl
+        self.max_frames = max_frames
+        self.grace = grace
+        self._logs: Dict[Tuple[str, str], ResponseLog] = {}
+        self.evicted = 0
+        self.unbuffered = 0
+        self.resumed = 0
+        self.gaps = 0
+        self.misses = 0
+
+    def open(self, session_id: str, request_id: str, upstream: Optional[ResponseLog] = None) -> ResponseLog:
+        """
+        Start buffering a new response
+
+        :param upstream: Log of the response this one replays, kept running by its readers
+        :return: Log of the response; not kept for resuming when the buffer is
+                 full of running responses
+        """
+        self._expire()
+        log = ResponseLog(session_id, request_id, self.max_frames, self.grace, upstream)
+        if len(self._logs) >= self.max_responses:
+            finished = [(key, other) for key, other in self._logs.items() if other.done]
+            if not finished:
+                self.unbuffered += 1
+                logger.warning("Replay buffer is full of running responses", extra={"request_id": request_id})
+                return log
+            key, _ = min(finished, key=lambda item: item[1].finished_at)
+            del self._logs[key]
+            self.evicted += 1
+        self._logs[(session_id, request_id)] = log
+        return log
+
+    def get(self, session_id: str, request_id: str) -> Optional[ResponseLog]:
+        return self._logs.get((session_id, request_id))
+
+    def resume(self, session_id: str, request_id: str, after: int) -> Optional[AsyncGenerator[bytes, None]]:
+        """
+        Follow a buffered response from the event after `after`
+
+        :return: Async generator of frames, or None if the response is unknown or expired
+        :raises ResumeGap: If the frames after `after` have already been dropped
+        """
+        self._expire()
+        log = self._logs.get((session_id, request_id))
+        if log is None:
+            self.misses += 1
+            return None
+        if not log.can_resume_after(after):
+            self.gaps += 1
+            raise ResumeGap(f"Events after {request_id}-{after} are no longer buffered")
+        self.resumed += 1
+        log.resumes += 1
+        return log.follow(after)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "responses": len(self._logs),
+            "in_progress": sum(1 for log in self._logs.values() if not log.done),
+            "frames": sum(len(log.frames) for log in self._logs.values()),
+            "resumed": self.resumed,
+            "misses": self.misses,
+            "gaps": self.gaps,
+            "evicted": self.evicted,
+            "unbuffered": self.unbuffered
+        }
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        expired = [
+            key for key, log in self._logs.items()
+            if log.finished_at is not None and log.finished_at < cutoff
+        ]
+        for key in expired:
+            del self._logs[key]
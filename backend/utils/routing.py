@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from utils.metrics import LLM_FIRST_RESPONSE_SECONDS, LLM_HEDGES, LLM_ROUTED
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TIER_SIMPLE = "simple"
+TIER_FULL = "full"
+
+# Words that suggest the turn needs a tool or careful reasoning; checked in the
+# user's message and in the assistant message it answers
+_TOOL_HINTS = re.compile(
+    r"weather|forecast|rain|temperature|appointment|book|schedul|reserv|test.?drive|"
+    r"availab|slot|time|date|tomorrow|today|dealer|address|nearest|where|locat|price|financ|compare|\d"
+)
+
+# Marks a stream that ended before its first chunk
+_END = object()
+
+
+class LatencyWindow:
+    __slots__ = ("samples",)
+
+    def __init__(self, size: int):
+        """
+        Most recent response latencies of one model
+        """
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _ModelStats:
+    __slots__ = ("requests", "completed", "wins", "losses", "errors", "latency")
+
+    def __init__(self, window: int):
+        self.requests = 0
+        self.completed = 0
+        # Outcomes of races against another model that was still running
+        self.wins = 0
+        self.losses = 0
+        self.errors = 0
+        self.latency = LatencyWindow(window)
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        model: str,
+        fast_model: str,
+        hedge_model: str,
+        routing_enabled: bool,
+        simple_max_words: int,
+        hedge_enabled: bool,
+        hedge_delay: float,
+        hedge_min_delay: float,
+        hedge_percentile: float,
+        window: int = 200,
+        min_samples: int = 20
+    ):
+        """
+        Chooses the model for each turn and hedges slow calls with a second model
+
+        Short turns with no sign of a tool call go to fast_model. When hedging
+        is on and the chosen model has not produced its first response within
+        the hedge delay, the same request is sent to the hedge model; the first
+        to respond wins and the other is cancelled. The delay tracks the chosen
+        model's recent latency percentile, so roughly (1 - hedge_percentile)
+        of calls are duplicated.
+
+        :param model: Default model for every turn
+        :param fast_model: Smaller model for simple turns
+        :param hedge_model: Model raced against a slow call; empty races the
+                            other tier's model
+        :param routing_enabled: Send simple turns to fast_model
+        :param simple_max_words: Longest user message treated as simple
+        :param hedge_enabled: Race slow calls against the hedge model
+        :param hedge_delay: Seconds before hedging while a model has too few samples
+        :param hedge_min_delay: Lower bound of the adaptive hedge delay
+        :param hedge_percentile: Latency percentile used as the hedge delay
+        :param window: Latency samples kept per model
+        :param min_samples: Samples needed before the delay adapts
+        """
+        self.model = model
+        self.fast_model = fast_model
+        self.hedge_model = hedge_model
+        self.routing_enabled = routing_enabled
+        self.simple_max_words = simple_max_words
+        self.hedge_enabled = hedge_enabled
+        self.default_hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_percentile = hedge_percentile
+        self.window = window
+        self.min_samples = min_samples
+        self._models: Dict[str, _ModelStats] = {}
+        self.routed = {TIER_SIMPLE: 0, TIER_FULL: 0}
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def route(self, messages: List[Dict[str, str]]) -> Tuple[str, str]:
+        """
+        Pick the routing tier and model for the next completion
+
+        :param messages: Prompt messages, ending with the user's turn
+        :return: (tier, model)
+        """
+        tier = self.classify(messages) if self.routing_enabled else TIER_FULL
+        model = self.fast_model if tier == TIER_SIMPLE else self.model
+        self.routed[tier] += 1
+        LLM_ROUTED.labels(tier, model).inc()
+        return tier, model
+
+    def classify(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Treat a turn as simple when the user's message is short and neither it
+        nor the assistant message it answers hints at a tool or a booking step
+        """
+        user = messages[-1]["content"] if messages and messages[-1]["role"] == "user" else ""
+        if not user or len(user.split()) > self.simple_max_words:
+            return TIER_FULL
+        previous = next((m["content"] or "" for m in reversed(messages[:-1]) if m["role"] == "assistant"), "")
+        if _TOOL_HINTS.search(user.lower()) or _TOOL_HINTS.search(previous.lower()):
+            return TIER_FULL
+        return TIER_SIMPLE
+
+    def hedge_delay(self, model: str) -> float:
+        """
+        Seconds to wait for model before sending the hedged duplicate
+        """
+        stats = self._models.get(model)
+        if stats is None or len(stats.latency.samples) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.hedge_min_delay, stats.latency.percentile(self.hedge_percentile))
+
+    def hedge_target(self, model: str) -> Optional[str]:
+        """
+        Model to race against model, or None when it would only race itself
+        """
+        if self.hedge_model:
+            target = self.hedge_model
+        else:
+            target = self.model if model == self.fast_model else self.fast_model
+        return target if target != model else None
+
+    async def call(self, attempt: Callable[[str], Awaitable[T]], model: str) -> T:
+        """
+        Run a completion on model, hedged when enabled
+
+        :param attempt: Starts the completion on the given model
+        :param model: Model chosen by route()
+        :return: Result of whichever call finished first
+        """
+        hedge = self.hedge_target(model) if self.hedge_enabled else None
+        if hedge is None:
+            return await self._timed(model, attempt(model))
+        _, result = await self._race(model, hedge, attempt, None)
+        return result
+
+    async def stream(self, start: Callable[[str], AsyncIterator[Any]], model: str) -> AsyncGenerator[Any, None]:
+        """
+        Stream a completion from model, hedged on the first chunk when enabled
+
+        Once a stream has produced its first chunk it is the only one read.
+
+        :param start: Opens the stream on the given model
+        :param model: Model chosen by route()
+        :return: Async generator of the winning stream's chunks
+        """
+        hedge = self.hedge_target(model) if self.hedge_enabled else None
+        if hedge is None:
+            iterator = start(model).__aiter__()
+            first = await self._timed(model, self._first(iterator))
+        else:
+            iterators: Dict[int, AsyncIterator[Any]] = {}
+
+            def _launch(slot: int, name: str) -> Awaitable[Any]:
+                iterators[slot] = start(name).__aiter__()
+                return self._first(iterators[slot])
+
+            async def _discard(slot: int) -> None:
+                await self._close(iterators.pop(slot))
+
+            slot, first = await self._race(model, hedge, _launch, _discard)
+            iterator = iterators.pop(slot)
+
+        try:
+            if first is _END:
+                return
+            yield first
+            async for chunk in iterator:
+                yield chunk
+        finally:
+            await self._close(iterator)
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for name, stats in self._models.items():
+            p50 = stats.latency.percentile(0.5)
+            p95 = stats.latency.percentile(0.95)
+            models[name] = {
+                "requests": stats.requests,
+                "completed": stats.completed,
+                "wins": stats.wins,
+                "losses": stats.losses,
+                "errors": stats.errors,
+                "win_rate": round(stats.wins / raced, 3) if (raced := stats.wins + stats.losses) else None,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "hedge_delay_ms": round(self.hedge_delay(name) * 1000, 1)
+            }
+        return {
+            "routing_enabled": self.routing_enabled,
+            "hedge_enabled": self.hedge_enabled,
+            "routed_simple": self.routed[TIER_SIMPLE],
+            "routed_full": self.routed[TIER_FULL],
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "models": models
+        }
+
+    def _stats(self, model: str) -> _ModelStats:
+        stats = self._models.get(model)
+        if stats is None:
+            stats = self._models[model] = _ModelStats(self.window)
+        return stats
+
+    def _record(self, model: str, seconds: float) -> None:
+        # Only completed calls are sampled; a cancelled loser's truncated time
+        # would pull the hedge delay down
+        stats = self._stats(model)
+        stats.latency.add(seconds)
+        stats.completed += 1
+        LLM_FIRST_RESPONSE_SECONDS.labels(model).observe(seconds)
+
+    async def _timed(self, model: str, awaitable: Awaitable[T]) -> T:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        stats = self._stats(model)
+        stats.requests += 1
+        try:
+            result = await awaitable
+        except Exception:
+            stats.errors += 1
+            raise
+        self._record(model, loop.time() - started)
+        return result
+
+    async def _race(
+        self,
+        model: str,
+        hedge: str,
+        launch: Callable[..., Awaitable[T]],
+        discard: Optional[Callable[[int], Awaitable[None]]]
+    ) -> Tuple[int, T]:
+        """
+        Start model, add hedge after the hedge delay or a failure, and
+        return the slot and result of the first call to succeed
+
+        :param launch: Called as launch(slot, name) when discard is given,
+                       otherwise as launch(name)
+        :param discard: Releases the resources of a losing slot
+        """
+        loop = asyncio.get_running_loop()
+        pending: Dict[asyncio.Future, Tuple[int, str, float]] = {}
+
+        def _start(slot: int, name: str) -> None:
+            self._stats(name).requests += 1
+            awaitable = launch(slot, name) if discard is not None else launch(name)
+            pending[asyncio.ensure_future(awaitable)] = (slot, name, loop.time())
+
+        _start(0, model)
+        hedge_at: Optional[float] = loop.time() + self.hedge_delay(model)
+        error: Optional[BaseException] = None
+        winner: Optional[Tuple[int, T]] = None
+
+        try:
+            while pending and winner is None:
+                timeout = max(hedge_at - loop.time(), 0) if hedge_at is not None else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The primary is slower than usual; race a duplicate against it
+                    hedge_at = None
+                    self.hedged += 1
+                    _start(1, hedge)
+                    continue
+
+                for task in done:
+                    slot, name, started = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        error = e
+                        self._stats(name).errors += 1
+                        if discard is not None:
+                            await discard(slot)
+                        continue
+                    self._record(name, loop.time() - started)
+                    if pending:
+                        # The other call is still running, so this one won a race
+                        self._stats(name).wins += 1
+                    winner = (slot, result)
+                    if slot == 1:
+                        self.hedge_wins += 1
+                    if hedge_at is None:
+                        LLM_HEDGES.labels("hedge_won" if slot == 1 else "primary_won").inc()
+                    break
+
+                if winner is None and hedge_at is not None:
+                    # The primary failed before the deadline; hedge at once
+                    hedge_at = None
+                    self.hedged += 1
+                    _start(1, hedge)
+        finally:
+            for task in pending:
+                task.cancel()
+            try:
+                # The losers' own cancellations are returned, not raised; a
+                # cancellation aimed at this task still propagates
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+            finally:
+                for task, (slot, name, started) in pending.items():
+                    if winner is not None:
+                        self._stats(name).losses += 1
+                    if discard is not None:
+                        await discard(slot)
+
+        if winner is None:
+            raise error
+        return winner
+
+    @staticmethod
+    async def _first(iterator: AsyncIterator[Any]) -> Any:
+        try:
+            return await iterator.__anext__()
+        except StopAsyncIteration:
+            return _END
+
+    @staticmethod
+    async def _close(iterator: AsyncIterator[Any]) -> None:
+        close = getattr(iterator, "aclose", None)
+        if close is not None:
+            await close()
@@ -0,0 +1,208 @@
+import asyncio
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional
+
+
+class SessionQueueFull(Exception):
+    """
+    Raised when a session already has the maximum number of queued requests
+    """
+
+
+# Sent to duplicate requests when the response they share stops early
+ABANDONED_EVENT = {
+    "event": "error",
+    "data": "The original request was stopped before it finished. Please send your message again."
+}
+
+
+class _Broadcast:
+    def __init__(self, request_id: Optional[str]):
+        """
+        Events of one in-flight response, replayable by duplicate requests
+
+        :param request_id: Request ID of the request producing the events
+        """
+        self.request_id = request_id
+        self.events: List[Dict[str, str]] = []
+        self.done = False
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: Dict[str, str]) -> None:
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def close(self, abandoned: bool = False) -> None:
+        """
+        Mark the response complete; an abandoned one ends with ABANDONED_EVENT
+        """
+        async with self._changed:
+            if abandoned:
+                self.events.append(ABANDONED_EVENT)
+            self.done = True
+            self._changed.notify_all()
+
+    async def replay(self) -> AsyncGenerator[Dict[str, str], None]:
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.events) or self.done)
+                pending = self.events[position:]
+                finished = self.done
+            for event in pending:
+                yield event
+            position += len(pending)
+            if finished and position >= len(self.events):
+                return
+
+
+class _SessionSlot:
+    __slots__ = ("lock", "depth", "held", "followers", "active")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+        # Batch holds; kept apart from depth so they never fill the queue
+        self.held = 0
+        self.followers = 0
+        # Normalized query -> broadcast of the request answering it
+        self.active: Dict[str, _Broadcast] = {}
+
+
+class SessionTicket:
+    def __init__(self, gate: "SessionGate", session_id: str, slot: _SessionSlot, query_key: str, broadcast: _Broadcast, leader: bool):
+        self._gate = gate
+        self._session_id = session_id
+        self._slot = slot
+        self._query_key = query_key
+        self._broadcast = broadcast
+        self.leader = leader
+
+    @property
+    def leader_request_id(self) -> Optional[str]:
+        """
+        Request ID of the request producing this ticket's response
+        """
+        return self._broadcast.request_id
+
+    async def run(self, events: AsyncGenerator[Dict[str, str], None]) -> AsyncGenerator[Dict[str, str], None]:
+        """
+        Produce the response once this request reaches the head of its session queue
+
+        Duplicate requests attached to this ticket replay the same events. If
+        the response stops early they receive ABANDONED_EVENT, so they never
+        wait for an end event that will not come.
+
+        :param events: Lazily started generator producing the response events
+        :return: Async generator of the same events
+        """
+        completed = False
+        try:
+            async with self._slot.lock, aclosing(events):
+                async for event in events:
+                    await self._broadcast.publish(event)
+                    yield event
+            completed = True
+        finally:
+            await self._broadcast.close(abandoned=not completed)
+            self._gate._release(self)
+
+    async def replay(self) -> AsyncGenerator[Dict[str, str], None]:
+        """
+        Stream the events of the identical request already in flight
+        """
+        try:
+            async for event in self._broadcast.replay():
+                yield event
+        finally:
+            self._gate._release(self)
+
+
+class SessionGate:
+    def __init__(self, max_depth: int, coalesce: bool):
+        """
+        Serialize requests per session so each session has at most one upstream call
+
+        :param max_depth: Maximum running plus waiting requests per session
+        :param coalesce: Attach identical in-flight queries to the running response
+        """
+        self.max_depth = max_depth
+        self.coalesce = coalesce
+        self._slots: Dict[str, _SessionSlot] = {}
+        self.rejected = 0
+        self.coalesced = 0
+
+    def admit(self, session_id: str, query: str, request_id: Optional[str] = None) -> SessionTicket:
+        """
+        Admit a request into its session's queue
+
+        :param session_id: Unique session identifier
+        :param query: User query, used to detect duplicate submissions
+        :param request_id: ID of this request, reported to duplicates that attach to it
+        :return: Ticket; when ticket.leader is False, replay() the shared response
+        :raises SessionQueueFull: If the session queue is already full
+        """
+        slot = self._slots.get(session_id)
+        if slot is None:
+            slot = self._slots[session_id] = _SessionSlot()
+
+        query_key = " ".join(query.split()).casefold()
+        broadcast: Optional[_Broadcast] = slot.active.get(query_key) if self.coalesce else None
+        if broadcast is not None and not broadcast.done:
+            slot.followers += 1
+            self.coalesced += 1
+            return SessionTicket(self, session_id, slot, query_key, broadcast, leader=False)
+
+        if slot.depth >= self.max_depth:
+            self.rejected += 1
+            self._discard_if_idle(session_id, slot)
+            raise SessionQueueFull(f"Session {session_id} already has {slot.depth} requests in progress")
+
+        slot.depth += 1
+        broadcast = _Broadcast(request_id)
+        slot.active[query_key] = broadcast
+        return SessionTicket(self, session_id, slot, query_key, broadcast, leader=True)
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        """
+        Wait for the session's turn and hold it for the duration of the block
+
+        Used by callers that already serialize their own requests, such as a
+        batch; it does not count against max_depth and never coalesces.
+
+        :param session_id: Unique session identifier
+        """
+        slot = self._slots.get(session_id)
+        if slot is None:
+            slot = self._slots[session_id] = _SessionSlot()
+        slot.held += 1
+        try:
+            async with slot.lock:
+                yield
+        finally:
+            slot.held -= 1
+            self._discard_if_idle(session_id, slot)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._slots),
+            "in_progress": sum(slot.depth + slot.held for slot in self._slots.values()),
+            "rejected": self.rejected,
+            "coalesced": self.coalesced
+        }
+
+    def _release(self, ticket: SessionTicket) -> None:
+        slot = ticket._slot
+        if ticket.leader:
+            slot.depth -= 1
+            if slot.active.get(ticket._query_key) is ticket._broadcast:
+                del slot.active[ticket._query_key]
+        else:
+            slot.followers -= 1
+        self._discard_if_idle(ticket._session_id, slot)
+
+    def _discard_if_idle(self, session_id: str, slot: _SessionSlot) -> None:
+        if slot.depth == 0 and slot.held == 0 and slot.followers == 0 and self._slots.get(session_id) is slot:
+            del self._slots[session_id]
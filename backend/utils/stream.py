@@ -1,6 +1,31 @@
 import asyncio
 import json
-from typing import AsyncGenerator, Dict, Any
+import os
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, Any, List, Optional
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:  # optional, speeds up tool_output encoding
+    orjson = None
+
+# Load environment variables
+load_dotenv()
+
+# SSE framing: text deltas are coalesced into one frame until it reaches
+# SSE_FRAME_MAX_BYTES or SSE_FLUSH_INTERVAL_MS has passed since its first delta
+SSE_FRAME_MAX_BYTES = int(os.getenv("SSE_FRAME_MAX_BYTES", "1024"))
+SSE_FLUSH_INTERVAL_MS = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "30"))
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
+HEARTBEAT_FRAME = b": ping\n\n"
+
+# Frames of events without data, such as "end", never change
+_EMPTY_FRAMES: Dict[str, bytes] = {}
+
+# Events read ahead of the framing loop, and the marker of the last one
+_READ_AHEAD = 32
+_END_OF_EVENTS = object()
 
 
 class StreamHelper:
@@ -8,7 +33,7 @@ class StreamHelper:
     async def chunked_stream(text: str, chunk_size: int = 1) -> AsyncGenerator[Dict[str, str], None]:
         """
         Generate text chunks for streaming with consistent event format
-        
+
         :param text: Full text to stream
         :param chunk_size: Size of each chunk
         :return: Async generator of text chunks
@@ -25,7 +50,7 @@ class StreamHelper:
     async def stream_tool_response(tool_name: str, tool_output: Dict[str, Any]) -> AsyncGenerator[Dict[str, str], None]:
         """
         Stream tool responses with consistent formatting
-        
+
         :param tool_name: Name of the tool used
         :param tool_output: Output from the tool
         :return: Async generator of tool response events
@@ -35,9 +60,162 @@ class StreamHelper:
             "event": "tool_use",
             "data": tool_name
         }
-        
+
         # Yield tool output event
         yield {
             "event": "tool_output",
-            "data": json.dumps(tool_output)
-        }
\ No newline at end of file
+            "data": StreamHelper.dumps(tool_output)
+        }
+
+    @staticmethod
+    def dumps(payload: Any) -> str:
+        """
+        Serialize a payload to compact JSON, using orjson when it is installed
+        """
+        if orjson is not None:
+            return orjson.dumps(payload).decode()
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+    @staticmethod
+    def encode_event(event: str, data: str, event_id: Optional[str] = None) -> bytes:
+        """
+        Encode one SSE event as wire bytes
+
+        :param event: Event name
+        :param data: Event data; multi-line data becomes several data lines
+        :param event_id: Optional ID the client reports back as Last-Event-ID
+        :return: Encoded frame
+        """
+        prefix = f"id: {event_id}\n" if event_id is not None else ""
+        if not data:
+            frame = _EMPTY_FRAMES.get(event)
+            if frame is None:
+                frame = _EMPTY_FRAMES[event] = f"event: {event}\ndata: \n\n".encode()
+            return prefix.encode() + frame if prefix else frame
+        if "\n" in data or "\r" in data:
+            # split() rather than splitlines() keeps a trailing newline as a
+            # final empty data line, so the client decodes the same text
+            text = data.replace("\r\n", "\n").replace("\r", "\n")
+            lines = "".join(f"data: {line}\n" for line in text.split("\n"))
+            return f"{prefix}event: {event}\n{lines}\n".encode()
+        return f"{prefix}event: {event}\ndata: {data}\n\n".encode()
+
+    @staticmethod
+    async def frame_events(
+        events: AsyncIterator[Dict[str, str]],
+        max_bytes: int = SSE_FRAME_MAX_BYTES,
+        flush_interval: float = SSE_FLUSH_INTERVAL_MS / 1000,
+        heartbeat_interval: float = SSE_HEARTBEAT_INTERVAL,
+        event_id: Optional[Callable[[], str]] = None
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Encode SSE events into frames, coalescing consecutive chunk events
+
+        The first chunk is sent at once so time to first token is unchanged.
+        Later chunks are buffered until the frame reaches max_bytes or
+        flush_interval has passed since the first buffered chunk. Any other
+        event flushes the buffer and is sent as is. A comment line is sent
+        when nothing has been sent for heartbeat_interval seconds.
+
+        Events are read by one task for the whole stream, so the upstream
+        generators run in a single context, and queued for the framing loop.
+
+        :param events: Event dicts with "event" and "data" keys
+        :param max_bytes: Buffered chunk bytes that force a flush
+        :param flush_interval: Longest time a chunk waits in the buffer
+        :param heartbeat_interval: Idle seconds before a heartbeat frame
+        :param event_id: Issues the ID of each event frame; each frame then
+                         carries exactly one event
+        :return: Async generator of encoded frames
+        """
+        def encode(name: str, data: str) -> bytes:
+            return StreamHelper.encode_event(name, data, event_id() if event_id is not None else None)
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(_READ_AHEAD)
+        reader = asyncio.create_task(StreamHelper._read_events(events, queue))
+        buffer: List[str] = []
+        buffered_bytes = 0
+        flush_at = 0.0
+        sent_chunk = False
+        last_sent = loop.time()
+
+        try:
+            while True:
+                if not queue.empty():
+                    event = queue.get_nowait()
+                else:
+                    deadline = flush_at if buffer else last_sent + heartbeat_interval
+                    try:
+                        async with asyncio.timeout_at(deadline):
+                            event = await queue.get()
+                    except TimeoutError:
+                        # Nothing new arrived in time; the reader keeps going
+                        if buffer:
+                            yield encode("chunk", "".join(buffer))
+                            buffer.clear()
+                            buffered_bytes = 0
+                        else:
+                            yield HEARTBEAT_FRAME
+                        last_sent = loop.time()
+                        continue
+
+                if event is _END_OF_EVENTS:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+
+                if event.get("event") == "chunk":
+                    data = event.get("data", "")
+                    if not sent_chunk:
+                        sent_chunk = True
+                        yield encode("chunk", data)
+                        last_sent = loop.time()
+                        continue
+                    if not buffer:
+                        flush_at = loop.time() + flush_interval
+                    buffer.append(data)
+                    buffered_bytes += len(data)
+                    if buffered_bytes < max_bytes:
+                        continue
+                    frame = encode("chunk", "".join(buffer))
+                else:
+                    if buffer:
+                        # Sent separately so a resumed client never gets a chunk twice
+                        yield encode("chunk", "".join(buffer))
+                        buffer.clear()
+                        buffered_bytes = 0
+                    frame = encode(event.get("event", "message"), event.get("data", ""))
+
+                buffer.clear()
+                buffered_bytes = 0
+                yield frame
+                last_sent = loop.time()
+
+            if buffer:
+                yield encode("chunk", "".join(buffer))
+        finally:
+            # Cancelling the reader reaches the pending read upstream; it closes the events itself
+            reader.cancel()
+            try:
+                await reader
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+
+    @staticmethod
+    async def _read_events(events: AsyncIterator[Dict[str, str]], queue: asyncio.Queue) -> None:
+        """
+        Feed the events of a stream into queue, then _END_OF_EVENTS or the exception that ended it
+        """
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(_END_OF_EVENTS)
+        finally:
+            close = getattr(events, "aclose", None)
+            if close is not None:
+                await close()
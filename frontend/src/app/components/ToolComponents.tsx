@@ -17,9 +17,12 @@ export const ToolOutputContainer = ({ toolName, data }: { toolName: string, data
       console.log('Rendering WeatherToolOutput');
       return <WeatherToolOutput data={data} />;
     case 'get_dealership_address':
+    case 'find_dealership':
+    case 'find_nearest_dealership':
       console.log('Rendering DealershipAddressToolOutput');
       return <DealershipAddressToolOutput data={data} />;
     case 'check_appointment_availability':
+    case 'find_earliest_appointments':
       console.log('Rendering AppointmentAvailabilityToolOutput');
       return <AppointmentAvailabilityToolOutput data={data} />;
     case 'schedule_appointment':